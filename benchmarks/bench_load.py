@@ -0,0 +1,40 @@
+from .common import SCALES, TIME_RANGE, setup_data
+
+
+PRODUCTS = ['s1_rtc', 's1_surfmi', 's1_coh', 's2_l2a', 'sanlc', 'cop_dem', 'mswep',
+            'chirps']
+
+
+def _load(product, bounds):
+    from sdc.load import load_product
+    time_range = None if product in ['sanlc', 'cop_dem'] else TIME_RANGE
+    return load_product(product=product, vec=list(bounds), time_range=time_range)
+
+
+class LoadProduct:
+    """Building the Dask graph of each product and computing it."""
+    params = (list(SCALES), PRODUCTS)
+    param_names = ['scale', 'product']
+    timeout = 300
+    
+    def setup(self, scale, product):
+        from sdc import get_client
+    
+        self.bounds = setup_data(scale)
+        get_client()
+        # Build the item index and warm the catalog cache beforehand
+        self.ds = _load(product, self.bounds)
+    
+    def time_build_graph(self, scale, product):
+        _load(product, self.bounds)
+    
+    def time_compute(self, scale, product):
+        self.ds.compute()
+    
+    def track_graph_tasks(self, scale, product):
+        return len(self.ds.__dask_graph__())
+    
+    def track_nbytes(self, scale, product):
+        return self.ds.nbytes
+    
+    track_nbytes.unit = 'bytes'
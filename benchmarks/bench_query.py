@@ -0,0 +1,59 @@
+from .common import SCALES, TIME_RANGE, setup_data
+
+
+class FilterCatalog:
+    """Reading and filtering the STAC Catalog of Sentinel-1 RTC."""
+    params = (list(SCALES), [True, False])
+    param_names = ['scale', 'use_index']
+    
+    def setup(self, scale, use_index):
+        from sdc.products import _ancillary as anc
+        from sdc.products import _query as query
+    
+        self.bounds = setup_data(scale)
+        self.catalog = anc.get_catalog(product='s1_rtc')
+        # Build the item index (and warm the cache of STAC Collections) beforehand
+        query.filter_stac_catalog(catalog=self.catalog, bbox=self.bounds,
+                                  use_index=use_index)
+    
+    def time_read_catalog(self, scale, use_index):
+        from sdc.products import _ancillary as anc
+        anc.clear_catalog_cache()
+        anc.get_catalog(product='s1_rtc')
+    
+    def time_filter_bbox(self, scale, use_index):
+        from sdc.products import _query as query
+        query.filter_stac_catalog(catalog=self.catalog, bbox=self.bounds,
+                                  use_index=use_index)
+    
+    def time_filter_bbox_time_range(self, scale, use_index):
+        from sdc.products import _query as query
+        query.filter_stac_catalog(catalog=self.catalog, bbox=self.bounds,
+                                  time_range=TIME_RANGE, use_index=use_index)
+    
+    def track_n_items(self, scale, use_index):
+        from sdc.products import _query as query
+        _, items = query.filter_stac_catalog(catalog=self.catalog, bbox=self.bounds,
+                                             use_index=use_index)
+        return len(items)
+
+
+class FilterPrecipFiles:
+    """Filtering the files of the precipitation products by time."""
+    params = list(SCALES)
+    param_names = ['scale']
+    
+    def setup(self, scale):
+        setup_data(scale)
+    
+    def time_filter_mswep_nc(self, scale):
+        from sdc.products import _ancillary as anc
+        from sdc.products import _query as query
+        query.filter_mswep_nc(directory=anc.get_catalog_path(product='mswep'),
+                              time_range=TIME_RANGE)
+    
+    def time_filter_chirps(self, scale):
+        from sdc.products import _ancillary as anc
+        from sdc.products import _query as query
+        query.filter_chirps(directory=anc.get_catalog_path(product='chirps'),
+                            time_range=TIME_RANGE)
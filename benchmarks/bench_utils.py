@@ -0,0 +1,77 @@
+import tempfile
+from pathlib import Path
+
+from .common import SCALES, TIME_RANGE, setup_data
+
+
+class Utils:
+    """The helpers of `sdc.utils` applied to loaded data."""
+    params = list(SCALES)
+    param_names = ['scale']
+    timeout = 300
+    
+    def setup(self, scale):
+        import geopandas as gpd
+        from shapely.geometry import box
+        from sdc import get_client
+        from sdc.load import load_product
+    
+        bounds = setup_data(scale)
+        get_client()
+        self.s1 = load_product(product='s1_rtc', vec=list(bounds),
+                               time_range=TIME_RANGE).persist()
+        self.s2 = load_product(product='s2_l2a', vec=list(bounds),
+                               time_range=TIME_RANGE, s2_apply_mask=False,
+                               s2_as_uint16=True).persist()
+    
+        # Vector file of a polygon covering the center of the synthetic data
+        minx, miny, maxx, maxy = bounds
+        dx, dy = (maxx - minx) / 4, (maxy - miny) / 4
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.vec = str(Path(self.tmpdir.name).joinpath('aoi.geojson'))
+        gpd.GeoDataFrame(geometry=[box(minx + dx, miny + dy, maxx - dx, maxy - dy)],
+                         crs=4326).to_file(self.vec)
+    
+    def teardown(self, scale):
+        self.tmpdir.cleanup()
+    
+    def time_groupby_acq_slices(self, scale):
+        from sdc.utils import groupby_acq_slices
+        groupby_acq_slices(self.s1).compute()
+    
+    def time_groupby_acq_slices_mosaic(self, scale):
+        from sdc.utils import groupby_acq_slices
+        groupby_acq_slices(self.s1, method='mosaic').compute()
+    
+    def time_apply_scale_factor(self, scale):
+        from sdc.utils import apply_scale_factor
+        apply_scale_factor(self.s2).compute()
+    
+    def time_mask_from_vec(self, scale):
+        self._mask_from_vec(labels=False)
+    
+    def time_mask_from_vec_labels(self, scale):
+        self._mask_from_vec(labels=True)
+    
+    def _mask_from_vec(self, labels):
+        # Rasterize in-process with an empty block cache to time the rasterization
+        import dask
+        from sdc import utils
+        utils._MASK_CACHE.clear()
+        with dask.config.set(scheduler='sync'):
+            utils.mask_from_vec(vec=self.vec, da=self.s1.vv, labels=labels).compute()
+    
+    def time_separate_asc_desc(self, scale):
+        from sdc.utils import separate_asc_desc
+        asc, desc = separate_asc_desc(self.s1)
+        asc.compute()
+        desc.compute()
+    
+    def time_separate_rel_orbits(self, scale):
+        from sdc.utils import separate_rel_orbits
+        for ds in separate_rel_orbits(self.s1).values():
+            ds.compute()
+    
+    def time_zonal_stats(self, scale):
+        from sdc.utils import zonal_stats
+        zonal_stats(self.s1[['vv', 'vh']], vec=self.vec, stats=['mean', 'std', 'p90'])
@@ -0,0 +1,62 @@
+"""
+Shared setup of the benchmarks: creates (once) a synthetic SALDi Data Cube per scale
+and points `sdc` to it.
+"""
+import os
+import json
+import tempfile
+from pathlib import Path
+
+from .synthetic import VERSION, create_synthetic_data, get_bounds
+
+
+# Size of the synthetic data per scale (see `create_synthetic_data`)
+SCALES = {'small': {'n_tiles': 1, 'n_times': 4, 'tile_size': 256},
+          'medium': {'n_tiles': 2, 'n_times': 12, 'tile_size': 512}}
+
+# Time range covering all acquisitions of the synthetic time series products
+TIME_RANGE = ('2020-01-01', '2020-12-31')
+
+
+def get_bench_root() -> Path:
+    """
+    Gets the directory of the synthetic data, which can be configured with the
+    `SDC_BENCH_ROOT` environment variable. Defaults to a directory in the temporary
+    directory of the system.
+    """
+    value = os.getenv("SDC_BENCH_ROOT")
+    if value is None or value.strip() == "":
+        return Path(tempfile.gettempdir()).joinpath("sdc-bench")
+    return Path(value)
+
+
+def setup_data(scale: str) -> tuple[float, float, float, float]:
+    """
+    Creates the synthetic data of a scale (unless it already exists) and configures
+    `sdc` to use it.
+    
+    Parameters
+    ----------
+    scale : str
+        Name of the scale (see `SCALES`).
+    
+    Returns
+    -------
+    tuple of float
+        The bounding box (minx, miny, maxx, maxy) covered by the synthetic data.
+    """
+    from sdc.products import _ancillary as anc
+    
+    config = SCALES[scale]
+    meta = {**config, 'version': VERSION}
+    root = get_bench_root().joinpath(scale)
+    marker = root.joinpath(".complete")
+    if not marker.exists() or json.loads(marker.read_text()) != meta:
+        create_synthetic_data(root=root, **config)
+        marker.write_text(json.dumps(meta))
+    
+    os.environ["SDC_DATA_ROOT"] = str(root)
+    os.environ["SDC_INDEX_DIR"] = str(root.joinpath(".index"))
+    os.environ.setdefault("SDC_CLUSTER", "local")
+    anc.clear_catalog_cache()
+    return get_bounds(root)
@@ -0,0 +1,313 @@
+"""
+Generator of a synthetic SALDi Data Cube for benchmarking and testing.
+
+The generated directory mimics the layout of the data root of the SDC (see
+`sdc.products._ancillary.get_data_root`): a directory per product, containing a
+self-contained STAC Catalog with one STAC Collection per tile and small COGs as
+assets, or the NetCDF/GeoTIFF files of the precipitation products. Point the
+`SDC_DATA_ROOT` environment variable to the generated directory to use it with
+`sdc.load.load_product`.
+
+Usage:
+
+    python -m benchmarks.synthetic /path/to/root --tiles 2 --times 12 --size 512
+"""
+import argparse
+import shutil
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pystac
+import rasterio
+import xarray as xr
+from rasterio.transform import from_origin
+
+from typing import Any, Optional
+
+
+# Version of the layout of the synthetic data, to be increased on any change of the
+# generator, so that existing data is recreated by the benchmarks
+VERSION = 1
+
+# Upper left corner of the synthetic tiles (roughly SALDi site06) and the pixel size
+# of the STAC products, which matches the default resolution of `load_product`
+ORIGIN = (31.0, -24.0)
+RESOLUTION = 0.0002
+
+# Bands of each STAC product as (name, dtype, value range)
+S1_RTC_BANDS = [('vv', 'float32', (0.001, 0.5)),
+                ('vh', 'float32', (0.0005, 0.1)),
+                ('area', 'float32', (0.5, 2.0)),
+                ('angle', 'uint8', (30, 46))]
+S1_SMI_BANDS = [('vv_q05', 'float32', (0.001, 0.02)),
+                ('vv_q95', 'float32', (0.1, 0.5))]
+S1_COH_BANDS = [('coh_vv', 'float32', (0.0, 1.0))]
+S2_L2A_BANDS = [(band, 'uint16', (1, 10000)) for band in
+                ['B02', 'B03', 'B04', 'B05', 'B06', 'B07', 'B08', 'B8A', 'B09',
+                 'B11', 'B12']] + [('SCL', 'uint8', (1, 12))]
+SANLC_BANDS = [('asset', 'uint8', (1, 73))]
+COP_DEM_BANDS = [('elevation', 'float32', (200.0, 1500.0))]
+
+# Temporal sampling of the STAC products as (start, interval in days, UTC hour)
+S1_RTC_TIMES = (datetime(2020, 1, 1), 6, [4, 16])
+S1_COH_TIMES = (datetime(2020, 1, 1), 12, [16])
+S2_L2A_TIMES = (datetime(2020, 1, 1), 5, [8])
+
+# Pixel size of the precipitation products
+MSWEP_RESOLUTION = 0.1
+CHIRPS_RESOLUTION = 0.05
+
+
+def create_synthetic_data(root: str | Path,
+                          n_tiles: int = 1,
+                          n_times: int = 4,
+                          tile_size: int = 256,
+                          seed: int = 42
+                          ) -> Path:
+    """
+    Creates a synthetic SALDi Data Cube with the products Sentinel-1 RTC, Sentinel-1
+    SurfMI references, Sentinel-1 Coherence, Sentinel-2 L2A, SANLC, Copernicus DEM,
+    MSWEP and CHIRPS.
+
+    Parameters
+    ----------
+    root : str or Path
+        Directory to create the synthetic data in. Existing product directories are
+        overwritten.
+    n_tiles : int, optional
+        Number of tiles (STAC Collections) in each dimension, i.e. `n_tiles**2` tiles
+        are created in total. Default is 1.
+    n_times : int, optional
+        Number of acquisitions per tile of the time series products. Default is 4.
+    tile_size : int, optional
+        Size of a tile in pixels in each dimension. Default is 256.
+    seed : int, optional
+        Seed of the random number generator. Default is 42.
+
+    Returns
+    -------
+    Path
+        The root directory of the synthetic data.
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    for product in ['S1_RTC', 'S1_SMI_2', 'S1_COH_2', 'S2_L2A', 'SANLC_2', 'COP_DEM',
+                    'MSWEP', 'CHIRPS']:
+        shutil.rmtree(root.joinpath(product), ignore_errors=True)
+    rng = np.random.default_rng(seed)
+    tiles = _tile_bounds(n_tiles=n_tiles, tile_size=tile_size)
+
+    s1_times = _acquisition_times(*S1_RTC_TIMES, n_times=n_times)
+    _create_stac_product(root.joinpath('S1_RTC'), tiles, S1_RTC_BANDS, s1_times,
+                         tile_size, rng, properties=_s1_properties)
+    _create_stac_product(root.joinpath('S1_SMI_2'), tiles, S1_SMI_BANDS,
+                         [datetime(2020, 1, 1)], tile_size, rng,
+                         file_suffix='_2017-2022')
+    _create_stac_product(root.joinpath('S1_COH_2'), tiles, S1_COH_BANDS,
+                         _acquisition_times(*S1_COH_TIMES, n_times=n_times),
+                         tile_size, rng)
+    _create_stac_product(root.joinpath('S2_L2A'), tiles, S2_L2A_BANDS,
+                         _acquisition_times(*S2_L2A_TIMES, n_times=n_times),
+                         tile_size, rng)
+    _create_stac_product(root.joinpath('SANLC_2'), tiles, SANLC_BANDS,
+                         [datetime(year, 1, 1) for year in [2018, 2020, 2022]],
+                         tile_size, rng)
+    _create_stac_product(root.joinpath('COP_DEM'), tiles, COP_DEM_BANDS,
+                         [datetime(2021, 4, 22)], tile_size, rng)
+
+    bounds = (tiles[0][0], tiles[-1][1], tiles[-1][2], tiles[0][3])
+    years = sorted({t.year for t in s1_times})
+    _create_mswep(root.joinpath('MSWEP'), bounds, years, rng)
+    _create_chirps(root.joinpath('CHIRPS'), bounds, years, rng)
+    return root
+
+
+def get_bounds(root: str | Path) -> tuple[float, float, float, float]:
+    """
+    Gets the bounding box (minx, miny, maxx, maxy) covered by all tiles of a synthetic
+    SALDi Data Cube.
+    """
+    catalog = pystac.Catalog.from_file(str(Path(root).joinpath('S1_RTC',
+                                                                'catalog.json')))
+    bboxes = np.asarray([c.extent.spatial.bboxes[0] for c in catalog.get_children()])
+    return (float(bboxes[:, 0].min()), float(bboxes[:, 1].min()),
+            float(bboxes[:, 2].max()), float(bboxes[:, 3].max()))
+
+
+def _tile_bounds(n_tiles: int,
+                 tile_size: int
+                 ) -> list[tuple[float, float, float, float]]:
+    """Creates the bounding boxes of a regular grid of adjacent tiles."""
+    extent = tile_size * RESOLUTION
+    tiles = []
+    for row in range(n_tiles):
+        for col in range(n_tiles):
+            minx = ORIGIN[0] + col * extent
+            maxy = ORIGIN[1] - row * extent
+            tiles.append((minx, maxy - extent, minx + extent, maxy))
+    return tiles
+
+
+def _acquisition_times(start: datetime,
+                       interval: int,
+                       hours: list[int],
+                       n_times: int
+                       ) -> list[datetime]:
+    """Creates acquisition times, alternating between the given UTC hours."""
+    return [start + timedelta(days=i * interval, hours=hours[i % len(hours)])
+            for i in range(n_times)]
+
+
+def _s1_properties(time: datetime) -> dict[str, Any]:
+    """Creates Sentinel-1 orbit properties, where the morning passes are descending."""
+    descending = time.hour < 12
+    return {'sat:orbit_state': 'descending' if descending else 'ascending',
+            'sat:relative_orbit': 21 if descending else 174}
+
+
+def _create_stac_product(directory: Path,
+                         tiles: list[tuple[float, float, float, float]],
+                         bands: list[tuple[str, str, tuple[float, float]]],
+                         times: list[datetime],
+                         tile_size: int,
+                         rng: np.random.Generator,
+                         properties: Optional[Any] = None,
+                         file_suffix: str = ''
+                         ) -> None:
+    """
+    Creates a self-contained STAC Catalog with one STAC Collection per tile and one
+    STAC Item (with a COG per band) per tile and acquisition time.
+    """
+    catalog = pystac.Catalog(id=directory.name.lower(),
+                             description=f"Synthetic {directory.name} data")
+    for i, bbox in enumerate(tiles):
+        tile_id = f"tile_{i:02d}"
+        extent = pystac.Extent(
+            spatial=pystac.SpatialExtent([list(bbox)]),
+            temporal=pystac.TemporalExtent([[times[0].replace(tzinfo=timezone.utc),
+                                             times[-1].replace(tzinfo=timezone.utc)]]))
+        collection = pystac.Collection(id=tile_id, description=tile_id, extent=extent)
+        for time in times:
+            item_id = f"{tile_id}_{time:%Y%m%dT%H%M%S}"
+            item_dir = directory.joinpath(tile_id, item_id)
+            item_dir.mkdir(parents=True, exist_ok=True)
+            props = {} if properties is None else properties(time)
+            item = pystac.Item(id=item_id, geometry=_bbox_to_polygon(bbox),
+                               bbox=list(bbox),
+                               datetime=time.replace(tzinfo=timezone.utc),
+                               properties=props)
+            for band, dtype, value_range in bands:
+                file = item_dir.joinpath(f"{band}{file_suffix}.tif")
+                _write_cog(file, bbox, tile_size, dtype, value_range, rng)
+                item.add_asset(band, pystac.Asset(href=str(file),
+                                                  media_type=pystac.MediaType.COG,
+                                                  roles=['data']))
+            collection.add_item(item)
+        catalog.add_child(collection)
+    catalog.normalize_hrefs(str(directory))
+    catalog.make_all_asset_hrefs_relative()
+    catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+
+
+def _bbox_to_polygon(bbox: tuple[float, float, float, float]) -> dict[str, Any]:
+    """Converts a bounding box to a GeoJSON polygon."""
+    minx, miny, maxx, maxy = bbox
+    return {'type': 'Polygon',
+            'coordinates': [[[minx, miny], [maxx, miny], [maxx, maxy], [minx, maxy],
+                             [minx, miny]]]}
+
+
+def _write_cog(file: Path,
+               bbox: tuple[float, float, float, float],
+               tile_size: int,
+               dtype: str,
+               value_range: tuple[float, float],
+               rng: np.random.Generator
+               ) -> None:
+    """Writes a single-band COG with random values in EPSG:4326."""
+    low, high = value_range
+    if np.issubdtype(np.dtype(dtype), np.integer):
+        data = rng.integers(low, high, size=(tile_size, tile_size), endpoint=True)
+    else:
+        data = rng.uniform(low, high, size=(tile_size, tile_size))
+    profile = {'driver': 'COG', 'width': tile_size, 'height': tile_size, 'count': 1,
+               'dtype': dtype, 'crs': 'EPSG:4326', 'compress': 'deflate',
+               'blocksize': min(512, tile_size),
+               'transform': from_origin(bbox[0], bbox[3], RESOLUTION, RESOLUTION)}
+    with rasterio.open(file, 'w', **profile) as dst:
+        dst.write(data.astype(dtype), 1)
+
+
+def _create_mswep(directory: Path,
+                  bounds: tuple[float, float, float, float],
+                  years: list[int],
+                  rng: np.random.Generator
+                  ) -> None:
+    """Creates yearly NetCDF files of daily precipitation like MSWEP."""
+    directory.mkdir(parents=True, exist_ok=True)
+    lon, lat = _precip_grid(bounds, MSWEP_RESOLUTION)
+    for year in years:
+        time = pd.date_range(f"{year}-01-01", f"{year}-12-31", freq='D')
+        data = rng.gamma(0.5, 4.0, size=(len(time), len(lat), len(lon)))
+        ds = xr.Dataset({'precipitation': (('time', 'lat', 'lon'),
+                                           data.astype('float32'))},
+                        coords={'time': time, 'lat': lat, 'lon': lon})
+        ds.to_netcdf(directory.joinpath(f"{year}.nc"))
+
+
+def _create_chirps(directory: Path,
+                   bounds: tuple[float, float, float, float],
+                   years: list[int],
+                   rng: np.random.Generator
+                   ) -> None:
+    """Creates monthly GeoTIFF files of precipitation like CHIRPS."""
+    directory.mkdir(parents=True, exist_ok=True)
+    lon, lat = _precip_grid(bounds, CHIRPS_RESOLUTION)
+    transform = from_origin(lon[0] - CHIRPS_RESOLUTION / 2,
+                            lat[0] + CHIRPS_RESOLUTION / 2,
+                            CHIRPS_RESOLUTION, CHIRPS_RESOLUTION)
+    profile = {'driver': 'GTiff', 'width': len(lon), 'height': len(lat), 'count': 1,
+               'dtype': 'float32', 'crs': 'EPSG:4326', 'nodata': -9999.,
+               'transform': transform}
+    for year in years:
+        for month in range(1, 13):
+            data = rng.gamma(2.0, 30.0, size=(len(lat), len(lon))).astype('float32')
+            data[0, 0] = -9999.
+            file = directory.joinpath(f"chirps-v3.0.{year}.{month:02d}.tif")
+            with rasterio.open(file, 'w', **profile) as dst:
+                dst.write(data, 1)
+
+
+def _precip_grid(bounds: tuple[float, float, float, float],
+                 resolution: float
+                 ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Creates the pixel center coordinates (ascending longitude, descending latitude) of
+    a global grid, limited to the given bounds plus a margin of one degree.
+    """
+    minx, miny, maxx, maxy = bounds
+    start_x = np.floor(minx - 1) + resolution / 2
+    start_y = np.ceil(maxy + 1) - resolution / 2
+    lon = np.round(np.arange(start_x, np.ceil(maxx + 1), resolution), 4)
+    lat = np.round(np.arange(start_y, np.floor(miny - 1), -resolution), 4)
+    return lon, lat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create a synthetic SALDi Data Cube.")
+    parser.add_argument('root', help="Directory to create the synthetic data in.")
+    parser.add_argument('--tiles', type=int, default=1,
+                        help="Number of tiles in each dimension.")
+    parser.add_argument('--times', type=int, default=4,
+                        help="Number of acquisitions of the time series products.")
+    parser.add_argument('--size', type=int, default=256,
+                        help="Size of a tile in pixels in each dimension.")
+    args = parser.parse_args()
+    root = create_synthetic_data(root=args.root, n_tiles=args.tiles,
+                                 n_times=args.times, tile_size=args.size)
+    print(f"Created synthetic data in {root}. Set SDC_DATA_ROOT={root} to use it.")
+
+
+if __name__ == '__main__':
+    main()
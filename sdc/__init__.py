@@ -1,6 +1,6 @@
 import dask
 import xarray as xr
-from ._cluster import start_cluster
+from ._cluster import start_cluster, get_client, get_cluster
 
 
 dask.config.set({"array.rechunk.method": "p2p",
@@ -8,4 +8,11 @@ dask.config.set({"array.rechunk.method": "p2p",
                  "array.chunk-size": "256MiB"})
 xr.set_options(keep_attrs=True)
 
-dask_client, dask_cluster = start_cluster()
+
+def __getattr__(name: str):
+    # `dask_client` and `dask_cluster` are created lazily on first access
+    if name == "dask_client":
+        return get_client()
+    if name == "dask_cluster":
+        return get_cluster()
+    raise AttributeError(f"module 'sdc' has no attribute '{name}'")
@@ -0,0 +1,63 @@
+import math
+
+from typing import Any
+from distributed.deploy.adaptive import Adaptive
+from distributed.protocol.pickle import dumps
+
+
+# Fraction of the memory limit of the workers that pending and stored task results
+# may occupy before more workers are requested
+MEMORY_TARGET_FRACTION = 0.6
+
+
+class MemoryAdaptive(Adaptive):
+    """
+    Adaptive scaling that additionally scales up based on the expected memory of
+    pending tasks. The default target of Dask (based on the expected runtime of all
+    pending tasks) is raised to the number of workers needed to hold the results
+    currently stored on the workers plus the estimated results of all pending tasks.
+    The results of pending tasks are estimated from the average size of the finished
+    tasks of the same type (task prefix).
+    """
+    
+    async def target(self) -> int:
+        target = await super().target()
+        response = await self.scheduler.run_function(function=dumps(memory_demand),
+                                                     args=dumps(()),
+                                                     kwargs=dumps({}),
+                                                     wait=True)
+        if response.get("status") != "OK":
+            return target
+        demand, worker_limit = response["result"]
+        if worker_limit <= 0:
+            return target
+        return max(target, math.ceil(demand / (worker_limit * MEMORY_TARGET_FRACTION)))
+
+
+def memory_demand(dask_scheduler: Any) -> tuple[int, int]:
+    """
+    Estimates the memory needed by the stored and pending tasks of a scheduler. Runs
+    on the scheduler.
+    
+    Returns
+    -------
+    demand : int
+        Bytes stored on all workers plus the estimated bytes of all pending tasks.
+    worker_limit : int
+        Average memory limit of a single worker in bytes (0 if unknown).
+    """
+    workers = list(dask_scheduler.workers.values())
+    stored = sum(ws.nbytes for ws in workers)
+    
+    pending = 0
+    for prefix in dask_scheduler.task_prefixes.values():
+        states = prefix.states
+        n_done = states.get("memory", 0) + states.get("released", 0)
+        n_pending = (states.get("waiting", 0) + states.get("queued", 0) +
+                     states.get("processing", 0) + states.get("no-worker", 0))
+        if n_done > 0 and n_pending > 0:
+            pending += prefix.nbytes_total / n_done * n_pending
+    
+    limits = [ws.memory_limit for ws in workers if ws.memory_limit]
+    worker_limit = int(sum(limits) / len(limits)) if limits else 0
+    return int(stored + pending), worker_limit
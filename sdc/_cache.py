@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+from pathlib import Path
+import xarray as xr
+
+from typing import Any, Optional
+from xarray import Dataset, DataArray
+
+
+DEFAULT_CACHE_DIR = Path.home().joinpath(".cache", "sdc", "results")
+DEFAULT_CACHE_SIZE = 50  # GiB
+STALE_AFTER = 24 * 3600  # seconds after which incomplete entries are removed
+
+_COMPLETE = ".sdc_complete"
+_DATAARRAY = "_sdc_dataarray"
+
+
+def get_cache_dir() -> Path:
+    """
+    Gets the directory of the result cache, which can be configured with the
+    `SDC_CACHE_DIR` environment variable. Defaults to `~/.cache/sdc/results`.
+    """
+    value = os.getenv("SDC_CACHE_DIR")
+    if value is None or value.strip() == "":
+        return DEFAULT_CACHE_DIR
+    return Path(value)
+
+
+def get_cache_size() -> int:
+    """
+    Gets the maximum size of the result cache in bytes, which can be configured in GiB
+    with the `SDC_CACHE_SIZE` environment variable. Defaults to 50 GiB.
+    """
+    value = os.getenv("SDC_CACHE_SIZE")
+    if value is None or value.strip() == "":
+        value = DEFAULT_CACHE_SIZE
+    return int(float(value) * 1024**3)
+
+
+def cache_key(**kwargs: Any) -> str:
+    """
+    Creates a cache key from keyword arguments, e.g. product name, bounds, time range,
+    resolved loading parameters and a fingerprint of the underlying STAC Catalog.
+    
+    Parameters
+    ----------
+    **kwargs : Any
+        Keyword arguments defining the cached result. Values need to be serializable
+        to JSON or have a meaningful string representation.
+    
+    Returns
+    -------
+    str
+        The cache key.
+    """
+    return hashlib.sha1(json.dumps(kwargs, sort_keys=True,
+                                   default=str).encode()).hexdigest()
+
+
+def load_cached(key: str) -> Optional[Dataset | DataArray]:
+    """
+    Lazily opens a cached result.
+    
+    Parameters
+    ----------
+    key : str
+        The cache key as returned by `cache_key`.
+    
+    Returns
+    -------
+    Dataset or DataArray or None
+        The cached result or None if no complete entry exists for the key.
+    """
+    path = get_cache_dir().joinpath(f"{key}.zarr")
+    if not path.joinpath(_COMPLETE).exists():
+        return None
+    path.joinpath(_COMPLETE).touch()
+    # CF attributes (e.g. `scale_factor` of Sentinel-2 L2A loaded as uint16) are kept
+    # as attributes instead of being decoded, so that the data is returned as stored
+    ds = xr.open_zarr(path, decode_coords="all", mask_and_scale=False)
+    name = ds.attrs.pop(_DATAARRAY, None)
+    if name is not None:
+        return ds[name]
+    return ds
+
+
+def store(key: str,
+          ds: Dataset | DataArray
+          ) -> Dataset | DataArray:
+    """
+    Writes a result to the cache, evicts the least recently used entries if the cache
+    exceeds its maximum size and reopens the result lazily from the cache. If the data
+    types or attributes of the reopened result differ from the original, the entry is
+    removed again and the original result is returned.
+    
+    Parameters
+    ----------
+    key : str
+        The cache key as returned by `cache_key`.
+    ds : Dataset or DataArray
+        The result to cache.
+    
+    Returns
+    -------
+    Dataset or DataArray
+        The result opened from the cache (or the original result, see above).
+    """
+    path = get_cache_dir().joinpath(f"{key}.zarr")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    
+    name = None
+    if isinstance(ds, DataArray):
+        name = ds.name if ds.name is not None else "data"
+        ds = ds.to_dataset(name=name).assign_attrs({_DATAARRAY: name})
+    ds = _regular_chunks(ds)
+    for v in ds.variables.values():
+        v.encoding.pop('chunks', None)
+        v.encoding.pop('preferred_chunks', None)
+        # Don't add a fill value, which would be returned as `_FillValue` attribute
+        v.encoding.setdefault('_FillValue', None)
+    ds.to_zarr(path, mode='w')
+    path.joinpath(_COMPLETE).touch()
+    
+    evict(keep=key)
+    cached = load_cached(key)
+    cached_ds = cached if isinstance(cached, Dataset) else cached.to_dataset()
+    mismatch = _round_trip_mismatch(ds, cached_ds)
+    if mismatch:
+        print(f"[WARNING] Result could not be cached without changing the data types "
+              f"or attributes of {mismatch}. Using the uncached result instead.")
+        shutil.rmtree(path, ignore_errors=True)
+        return ds if name is None else ds[name]
+    return cached
+
+
+def evict(max_size: Optional[int] = None,
+          keep: Optional[str] = None
+          ) -> None:
+    """
+    Removes the least recently used entries from the cache until its size is below the
+    maximum size. Incomplete entries (e.g. from interrupted writes) are removed once
+    they are older than `STALE_AFTER` seconds.
+    
+    Parameters
+    ----------
+    max_size : int, optional
+        Maximum size of the cache in bytes. Defaults to None, which uses the size
+        returned by `get_cache_size`.
+    keep : str, optional
+        Cache key of an entry that should not be removed.
+    """
+    if max_size is None:
+        max_size = get_cache_size()
+    cache_dir = get_cache_dir()
+    if not cache_dir.exists():
+        return
+    
+    entries = []
+    for path in cache_dir.glob("*.zarr"):
+        if path.name == f"{keep}.zarr":
+            max_size -= _dir_size(path)
+        elif not path.joinpath(_COMPLETE).exists():
+            if time.time() - path.stat().st_mtime > STALE_AFTER:
+                shutil.rmtree(path, ignore_errors=True)
+        else:
+            entries.append((path.joinpath(_COMPLETE).stat().st_mtime, path))
+    
+    entries = sorted(entries, reverse=True)
+    total = 0
+    for _, path in entries:
+        total += _dir_size(path)
+        if total > max_size:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def clear() -> None:
+    """Removes all entries from the cache."""
+    shutil.rmtree(get_cache_dir(), ignore_errors=True)
+
+
+def _dir_size(path: Path) -> int:
+    """Computes the total size of all files in a directory in bytes."""
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def _round_trip_mismatch(ds: Dataset,
+                         cached: Dataset
+                         ) -> list[str]:
+    """
+    Gets the names of all variables whose data type or attributes differ between a
+    result and the result opened from the cache.
+    """
+    mismatch = []
+    for name, v in ds.variables.items():
+        if name not in cached.variables:
+            mismatch.append(name)
+            continue
+        dtype, cached_dtype = v.dtype, cached[name].dtype
+        if dtype.kind == 'M' and cached_dtype.kind == 'M':
+            # The time resolution of datetime coordinates may change
+            dtype = cached_dtype
+        if (dtype != cached_dtype or
+                json.dumps(v.attrs, sort_keys=True, default=str) !=
+                json.dumps(cached[name].attrs, sort_keys=True, default=str)):
+            mismatch.append(name)
+    return mismatch
+
+
+def _regular_chunks(ds: Dataset) -> Dataset:
+    """
+    Rechunks dimensions with irregular chunk sizes (which cannot be written to Zarr)
+    to their largest chunk size.
+    """
+    rechunk = {}
+    for v in ds.data_vars.values():
+        for dim, chunks in zip(v.dims, v.chunks or []):
+            if len(set(chunks[:-1])) > 1 or chunks[-1] > chunks[0]:
+                rechunk[dim] = max(max(chunks), rechunk.get(dim, 0))
+    if rechunk:
+        ds = ds.chunk(rechunk)
+    return ds
@@ -1,7 +1,10 @@
 import os
-from draco import start_slurm_cluster
+import shutil
 
-from typing import Any
+from typing import Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from dask.distributed import Client, SpecCluster
 
 
 DEFAULT_SLURM_CONFIG = {
@@ -11,6 +14,39 @@ DEFAULT_SLURM_CONFIG = {
     "queues_to_try": ['short', 'standard'],
 }
 
+DEFAULT_ADAPT_CONFIG = {
+    "minimum_jobs": 1,
+    "maximum_jobs": 1,
+    "idle_timeout": 300,
+}
+
+# Workload profiles overriding the default SLURM and scaling configuration:
+# - io: Many worker processes with few threads each for reading many files in
+#   parallel, scaled up quickly and released soon after loading has finished.
+# - compute: Few worker processes with a lot of memory each for reductions with
+#   large intermediate results, kept around longer between computations.
+WORKLOAD_PROFILES = {
+    "default": {},
+    "io": {
+        "processes": 6,
+        "cores": 12,
+        "memory": "18 GiB",
+        "minimum_jobs": 1,
+        "maximum_jobs": 4,
+        "idle_timeout": 120,
+    },
+    "compute": {
+        "processes": 2,
+        "cores": 12,
+        "memory": "48 GiB",
+        "minimum_jobs": 1,
+        "maximum_jobs": 2,
+        "idle_timeout": 600,
+    },
+}
+
+ADAPT_INTERVAL = 10  # seconds between two scaling decisions
+
 
 def _get_int_env(name: str, default: int) -> int:
     value = os.getenv(name)
@@ -45,25 +81,193 @@ def _get_list_env(name: str, default: list[str]) -> list[str]:
     return [item.strip() for item in value.split(",") if item.strip()]
 
 
-def get_slurm_config() -> dict[str, Any]:
+def get_profile(profile: str | None = None) -> dict[str, Any]:
+    """
+    Gets the settings of a workload profile. The profile can be selected with the
+    `SDC_SLURM_PROFILE` environment variable and is 'default' if not set.
+    
+    Parameters
+    ----------
+    profile : str, optional
+        Name of the workload profile (see `WORKLOAD_PROFILES`). Defaults to None, which
+        uses the profile set via `SDC_SLURM_PROFILE`.
+    
+    Returns
+    -------
+    dict
+        The default SLURM and scaling configuration updated with the profile settings.
+    """
+    if profile is None:
+        profile = os.getenv("SDC_SLURM_PROFILE", "default").strip().lower() or "default"
+    if profile not in WORKLOAD_PROFILES:
+        raise ValueError(f"Workload profile '{profile}' is not supported. Choose one "
+                         f"of {list(WORKLOAD_PROFILES)}.")
+    return {**DEFAULT_SLURM_CONFIG, **DEFAULT_ADAPT_CONFIG,
+            **WORKLOAD_PROFILES[profile]}
+
+
+def get_slurm_config(profile: str | None = None) -> dict[str, Any]:
+    defaults = get_profile(profile)
     return {
         "processes": _get_int_env(
             "SDC_SLURM_PROCESSES",
-            DEFAULT_SLURM_CONFIG["processes"],
+            defaults["processes"],
         ),
         "cores": _get_int_env(
             "SDC_SLURM_CORES",
-            DEFAULT_SLURM_CONFIG["cores"],
+            defaults["cores"],
         ),
         "memory": _get_memory_env(
             "SDC_SLURM_MEMORY",
-            DEFAULT_SLURM_CONFIG["memory"],
+            defaults["memory"],
         ),
         "queues_to_try": _get_list_env(
             "SDC_SLURM_QUEUES",
-            DEFAULT_SLURM_CONFIG["queues_to_try"],
+            defaults["queues_to_try"],
+        ),
+    }
+
+
+def get_adapt_config(profile: str | None = None) -> dict[str, Any]:
+    """
+    Gets the adaptive scaling configuration of the SLURM cluster. The values of the
+    workload profile can be overridden with the `SDC_SLURM_MIN_JOBS`,
+    `SDC_SLURM_MAX_JOBS` and `SDC_SLURM_IDLE_TIMEOUT` (in seconds) environment
+    variables.
+    
+    Parameters
+    ----------
+    profile : str, optional
+        Name of the workload profile (see `WORKLOAD_PROFILES`). Defaults to None, which
+        uses the profile set via `SDC_SLURM_PROFILE`.
+    
+    Returns
+    -------
+    dict
+        Dictionary with the minimum and maximum number of SLURM jobs and the number of
+        seconds a worker needs to be idle before it is released.
+    """
+    defaults = get_profile(profile)
+    minimum_jobs = _get_int_env("SDC_SLURM_MIN_JOBS", defaults["minimum_jobs"])
+    maximum_jobs = _get_int_env("SDC_SLURM_MAX_JOBS", defaults["maximum_jobs"])
+    return {
+        "minimum_jobs": minimum_jobs,
+        "maximum_jobs": max(minimum_jobs, maximum_jobs),
+        "idle_timeout": _get_int_env(
+            "SDC_SLURM_IDLE_TIMEOUT",
+            defaults["idle_timeout"],
         ),
     }
 
-def start_cluster():
-    return start_slurm_cluster(**get_slurm_config())
+
+def adapt_cluster(cluster: "SpecCluster",
+                  profile: str | None = None
+                  ) -> None:
+    """
+    Enables adaptive scaling of a SLURM cluster between the minimum and maximum number
+    of jobs of the scaling configuration. Workers are scaled up based on the expected
+    runtime and memory of pending tasks and released after being idle for the idle
+    timeout. Nothing is done if the minimum and maximum number of jobs are equal.
+    
+    Parameters
+    ----------
+    cluster : SpecCluster
+        The SLURM cluster.
+    profile : str, optional
+        Name of the workload profile (see `WORKLOAD_PROFILES`). Defaults to None, which
+        uses the profile set via `SDC_SLURM_PROFILE`.
+    """
+    from sdc._adaptive import MemoryAdaptive
+
+    adapt = get_adapt_config(profile)
+    if adapt["minimum_jobs"] == adapt["maximum_jobs"]:
+        return
+    processes = get_slurm_config(profile)["processes"]
+    cluster.adapt(Adaptive=MemoryAdaptive,
+                  minimum=adapt["minimum_jobs"] * processes,
+                  maximum=adapt["maximum_jobs"] * processes,
+                  interval=f"{ADAPT_INTERVAL}s",
+                  wait_count=max(1, adapt["idle_timeout"] // ADAPT_INTERVAL))
+
+_CLIENT = None
+_CLUSTER = None
+
+
+def _slurm_available() -> bool:
+    """Checks whether a SLURM cluster can be started from this machine."""
+    try:
+        import draco  # noqa: F401
+    except ImportError:
+        return False
+    return shutil.which("sbatch") is not None
+
+
+def start_cluster(profile: str | None = None) -> tuple["Client", "SpecCluster"]:
+    """
+    Starts a new Dask cluster and connects a client to it.
+    
+    A SLURM cluster is started via `draco` if SLURM is available. Otherwise, a
+    `LocalCluster` is started as a fallback. The type of cluster can be forced by
+    setting the `SDC_CLUSTER` environment variable to either 'slurm' or 'local'.
+    
+    The resources and adaptive scaling of the SLURM cluster are defined by a workload
+    profile (see `WORKLOAD_PROFILES`), e.g. 'io' for loading-heavy or 'compute' for
+    reduction-heavy workflows, and can be overridden with the `SDC_SLURM_*`
+    environment variables (see `get_slurm_config` and `get_adapt_config`).
+    
+    Parameters
+    ----------
+    profile : str, optional
+        Name of the workload profile. Defaults to None, which uses the profile set via
+        the `SDC_SLURM_PROFILE` environment variable ('default' if not set).
+    
+    Returns
+    -------
+    tuple of Client and SpecCluster
+        The Dask client and the cluster it is connected to.
+    """
+    cluster_type = os.getenv("SDC_CLUSTER", "auto").strip().lower()
+    if cluster_type not in ["auto", "slurm", "local"]:
+        raise ValueError(f"Cluster type '{cluster_type}' is not supported.")
+    if cluster_type == "auto":
+        cluster_type = "slurm" if _slurm_available() else "local"
+    
+    if cluster_type == "slurm":
+        from draco import start_slurm_cluster
+        client, cluster = start_slurm_cluster(**get_slurm_config(profile))
+        adapt_cluster(cluster, profile)
+        return client, cluster
+    else:
+        from dask.distributed import Client, LocalCluster
+        cluster = LocalCluster()
+        return Client(cluster), cluster
+
+
+def get_client() -> "Client":
+    """
+    Gets the Dask client of the current session. The cluster is only started on the
+    first call and reused afterwards, unless the client has been closed in the
+    meantime.
+    
+    Returns
+    -------
+    Client
+        The Dask client of the current session.
+    """
+    global _CLIENT, _CLUSTER
+    if _CLIENT is None or _CLIENT.status in ["closing", "closed"]:
+        _CLIENT, _CLUSTER = start_cluster()
+    return _CLIENT
+
+
+def get_cluster() -> "SpecCluster":
+    """
+    Gets the Dask cluster of the current session. The cluster is started if needed.
+    
+    Returns
+    -------
+    SpecCluster
+        The Dask cluster of the current session.
+    """
+    get_client()
+    return _CLUSTER
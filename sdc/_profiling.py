@@ -0,0 +1,206 @@
+import os
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager, ExitStack
+from contextvars import ContextVar
+
+from typing import Any, Iterator, Optional
+
+
+_REPORT: ContextVar[Optional[dict[str, Any]]] = ContextVar("_REPORT", default=None)
+_RECORD: ContextVar[Optional[dict[str, Any]]] = ContextVar("_RECORD", default=None)
+_STACK: ContextVar[tuple[list[float], ...]] = ContextVar("_STACK", default=())
+
+
+def env_enabled() -> Optional[str]:
+    """
+    Checks whether profiling has been enabled with the `SDC_PROFILE` environment
+    variable, which can be set to '1' (print each record) or to a file path (append
+    each record as a JSON line).
+    
+    Returns
+    -------
+    str or None
+        The value of `SDC_PROFILE` or None if profiling is not enabled.
+    """
+    value = os.getenv("SDC_PROFILE", "").strip()
+    if value.lower() in ["", "0", "false", "no"]:
+        return None
+    return value
+
+
+def enabled() -> bool:
+    """Checks whether profiling is enabled via `profile_load` or `SDC_PROFILE`."""
+    return _REPORT.get() is not None or env_enabled() is not None
+
+
+@contextmanager
+def profile_load(performance_report: Optional[str] = None
+                 ) -> Iterator[dict[str, Any]]:
+    """
+    Context manager that profiles all calls of `load_product` (and all computations)
+    within its scope.
+    
+    For each call of `load_product`, the wall time of each stage (e.g. reading the
+    STAC Catalog, filtering STAC Items, building the Dask graph, masking), the number
+    of STAC Items and assets, the number of tasks of the Dask graph and the size of
+    the (uncompressed) result are recorded. For the compute phase, the wall time as
+    well as the number of tasks and the compute time per task type are recorded from
+    the Dask task stream. Optionally, a Dask performance report is written.
+    
+    Parameters
+    ----------
+    performance_report : str, optional
+        Path of an HTML file to write a Dask performance report of all computations
+        within the scope to. Default is None, which doesn't write a report.
+    
+    Yields
+    ------
+    dict
+        The report, which is filled while the context is active. It contains the
+        records of all calls of `load_product` under the 'loads' key and the
+        statistics of the compute phase under the 'compute' key.
+    
+    Examples
+    --------
+    >>> from sdc.load import load_product
+    >>> from sdc._profiling import profile_load
+    
+    >>> with profile_load(performance_report='report.html') as report:
+    ...     ds = load_product(product='s1_rtc', vec='site06',
+    ...                       time_range=('2020-01-01', '2020-02-01'))
+    ...     ds = ds.mean(dim='time').compute()
+    >>> report['loads'][0]['stages']
+    """
+    from distributed import get_task_stream, performance_report as dask_report
+    from sdc import get_client
+    
+    report = {'loads': [], 'compute': {}}
+    token = _REPORT.set(report)
+    start = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            client = get_client()
+            if performance_report is not None:
+                stack.enter_context(dask_report(filename=performance_report))
+            task_stream = stack.enter_context(get_task_stream(client=client))
+            yield report
+    finally:
+        _REPORT.reset(token)
+    
+    compute_time = defaultdict(float)
+    for task in task_stream.data:
+        for startstop in task.get('startstops', []):
+            if startstop['action'] == 'compute':
+                compute_time[_task_prefix(task['key'])] += (startstop['stop'] -
+                                                           startstop['start'])
+    report['compute'] = {'wall_time': time.perf_counter() - start,
+                         'n_tasks': len(task_stream.data),
+                         'compute_time': dict(sorted(compute_time.items(),
+                                                     key=lambda kv: -kv[1])),
+                         'performance_report': performance_report}
+    _emit({'event': 'compute', **report['compute']})
+
+
+@contextmanager
+def record_load(**info: Any) -> Iterator[Optional[dict[str, Any]]]:
+    """
+    Context manager that records the stages and counters of a single call of
+    `load_product`. Does nothing if profiling is not enabled.
+    
+    Parameters
+    ----------
+    **info : Any
+        Information describing the call, e.g. the product name.
+    
+    Yields
+    ------
+    dict or None
+        The record or None if profiling is not enabled.
+    """
+    if not enabled() or _RECORD.get() is not None:
+        yield None
+        return
+    
+    record = {**info, 'stages': {}, 'counts': {}, 'wall_time': 0.0}
+    token = _RECORD.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        _RECORD.reset(token)
+        record['wall_time'] = time.perf_counter() - start
+        report = _REPORT.get()
+        if report is not None:
+            report['loads'].append(record)
+        _emit({'event': 'load', **record})
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Context manager that adds the wall time of a stage to the current record. Time
+    spent in nested stages is only attributed to the nested stages.
+    
+    Parameters
+    ----------
+    name : str
+        Name of the stage.
+    """
+    record = _RECORD.get()
+    if record is None:
+        yield
+        return
+    
+    children = [0.0]
+    token = _STACK.set(_STACK.get() + (children,))
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _STACK.reset(token)
+        parents = _STACK.get()
+        if parents:
+            parents[-1][0] += elapsed
+        stages = record['stages']
+        stages[name] = stages.get(name, 0.0) + elapsed - children[0]
+
+
+def count(name: str,
+          value: int | float
+          ) -> None:
+    """
+    Adds a value to a counter of the current record (e.g. number of STAC Items). Does
+    nothing if no record is active.
+    
+    Parameters
+    ----------
+    name : str
+        Name of the counter.
+    value : int or float
+        Value to add.
+    """
+    record = _RECORD.get()
+    if record is not None:
+        record['counts'][name] = record['counts'].get(name, 0) + value
+
+
+def _task_prefix(key: Any) -> str:
+    """Gets the prefix (type) of a Dask task from its key."""
+    from dask.utils import key_split
+    return key_split(key)
+
+
+def _emit(entry: dict[str, Any]) -> None:
+    """Emits a profiling entry as a JSON line according to `SDC_PROFILE`."""
+    target = env_enabled()
+    if target is None:
+        return
+    line = json.dumps(entry, default=str)
+    if target.lower() in ["1", "true", "yes"]:
+        print(f"[PROFILE] {line}")
+    else:
+        with open(target, "a") as f:
+            f.write(line + "\n")
@@ -1,7 +1,9 @@
 from pathlib import Path
+import numpy as np
 import geopandas as gpd
+import shapely
 
-from typing import Optional
+from typing import Optional, Any, Iterator
 from xarray import Dataset, DataArray
 
 
@@ -11,8 +13,15 @@ def load_product(product: str,
                  time_pattern: Optional[str] = None,
                  s2_apply_mask: bool = True,
                  sanlc_year: Optional[int] = None,
-                 override_defaults: Optional[dict] = None
-                 ) -> Dataset | DataArray:
+                 override_defaults: Optional[dict] = None,
+                 s2_as_uint16: bool = False,
+                 use_cache: bool = False,
+                 clip: bool = False,
+                 access_pattern: Optional[str] = None,
+                 dry_run: bool = False,
+                 groupby: Optional[str] = None,
+                 fuse: str = 'first'
+                 ) -> Dataset | DataArray | dict[str, Any]:
     """
     Load data products available in the SALDi Data Cube (SDC).
     
@@ -30,7 +39,8 @@ def load_product(product: str,
     vec : str or Path or list of float
         Several options to define the spatial extent of the data to load:
         - Path to a vector file readable by GeoPandas (e.g. GeoJSON, Geopackage etc.). 
-        In this case, the bounding box of the vector file will be used to load the data.
+        In this case, the bounding box of the vector file will be used to load the data
+        (see also `clip`).
         - A list of float values defining a bounding box in the format: [minx, miny, 
         maxx, maxy].
         - A SALDi site name in the format 'siteXX', where XX is the site number.
@@ -63,27 +73,121 @@ def load_product(product: str,
         - resolution: 0.0002
         - resampling: 'bilinear'
         - chunks: {'time': -1, 'latitude': 'auto', 'longitude': 'auto'}
+    s2_as_uint16 : bool, optional
+        Whether to keep the Sentinel-2 L2A product as scaled integers (uint16) with 0 as
+        nodata value instead of converting it to float32 reflectance values. This
+        halves the memory footprint. Default is False. This parameter will be ignored
+        if `product` is not `s2_l2a`.
+    use_cache : bool, optional
+        Whether to use the local result cache. If True, the loaded (and masked/scaled)
+        data is written to a Zarr store on first use and lazily reopened from there on
+        subsequent calls with the same arguments, as long as the underlying STAC
+        Catalog has not changed. Default is False. The location and maximum size of
+        the cache can be configured with the `SDC_CACHE_DIR` and `SDC_CACHE_SIZE` (in
+        GiB) environment variables.
+    clip : bool, optional
+        Whether to clip the data to the actual geometries of the vector file instead of
+        only to their bounding box. If True, only STAC Items intersecting the
+        geometries are loaded, chunks that do not intersect them are never read and
+        all pixels outside of them are set to NaN (or the nodata value for integer
+        data). Default is False. This parameter will be ignored if `vec` is not a path
+        to a vector file.
+    access_pattern : str, optional
+        The intended access pattern of the loaded data, which is used to plan the
+        chunk sizes based on the number of acquisitions, the size of the area of
+        interest and the memory of the Dask workers (see
+        `sdc.products._chunks.plan_chunks`). Either 'timeseries' (whole time axis per
+        chunk, e.g. for pixel-wise time series analysis) or 'spatial' (single time
+        step per chunk, e.g. for per-scene processing). The plan, including the
+        estimated number of tasks and memory, is printed before loading. Default is
+        None, which uses the default chunks. This parameter will be ignored for the
+        MSWEP and CHIRPS products.
+    dry_run : bool, optional
+        Whether to only estimate the cost of loading instead of loading the data. The
+        estimate is derived from the catalog query and the loading parameters without
+        opening any files or reading any pixel data and contains the number of STAC
+        Items, assets and files to open, the output shape, the uncompressed size in
+        bytes, the chunk shape and count as well as a rough estimate of the number of
+        Dask tasks (see `sdc.products._chunks.estimate_load`). Default is False.
+    groupby : str, optional
+        How to group the STAC Items of the Sentinel-1 RTC and Sentinel-2 L2A products
+        into time steps while loading, so that slices or tiles of the same acquisition
+        are fused into a single time step before any pixels are returned. Options are
+        'time' (STAC Items with the same datetime), 'solar_day' (STAC Items of the same
+        day in local solar time) and 'datatake' (STAC Items of the same acquisition,
+        based on their orbit or datatake metadata). Default is None, which groups by
+        'time'. This parameter will be ignored for all other products.
+    fuse : str, optional
+        How to fuse overlapping pixels of the STAC Items of a time step: 'first'
+        (first valid pixel in time order) or 'mean' (mean of the valid pixels of all
+        STAC Items of a time step, however many overlap). For 'mean', each STAC Item
+        is loaded as a separate time step before the time steps are averaged, which
+        needs more memory and Dask tasks than 'first'. Default is 'first'. This
+        parameter will be ignored for all products except Sentinel-1 RTC and
+        Sentinel-2 L2A.
     
     Returns
     -------
-    ds : Dataset or DataArray
-        Xarray Dataset or DataArray containing the loaded data.
+    ds : Dataset or DataArray or dict
+        Xarray Dataset or DataArray containing the loaded data or a dictionary with the
+        cost estimate if `dry_run` is True.
     """
-    from sdc.vec import get_site_bounds
-    import sdc.products as prod
+    from sdc import get_client, _profiling
     
+    # Make sure a Dask cluster is running before building the task graph
+    if not dry_run:
+        get_client()
     
     if override_defaults is not None:
-        print("[WARNING] Overriding default loading parameters is only recommended for "
-              "advanced users. Start with the default parameters and only override "
-              "them if you know what you are doing.")
-        if product in ['mswep', 'chirps']:
-            print("[INFO] Overriding default loading parameters is currently not "
-                  f"supported for the {product.upper()} product. Default parameters will "
-                  "be used instead.")
+        _warn_override_defaults(product)
+    with _profiling.record_load(product=product, vec=vec, time_range=time_range):
+        return _load_product(product=product, vec=vec, time_range=time_range,
+                             time_pattern=time_pattern, s2_apply_mask=s2_apply_mask,
+                             sanlc_year=sanlc_year, override_defaults=override_defaults,
+                             s2_as_uint16=s2_as_uint16, use_cache=use_cache, clip=clip,
+                             access_pattern=access_pattern, dry_run=dry_run,
+                             groupby=groupby, fuse=fuse)
+
+
+def _warn_override_defaults(product: str) -> None:
+    """Prints a warning that default loading parameters are being overridden."""
+    print("[WARNING] Overriding default loading parameters is only recommended for "
+          "advanced users. Start with the default parameters and only override "
+          "them if you know what you are doing.")
+    if product in ['mswep', 'chirps']:
+        print("[INFO] Overriding default loading parameters is currently not "
+              f"supported for the {product.upper()} product. Default parameters will "
+              "be used instead.")
+
+
+def _load_product(product: str,
+                  vec: str | Path | list[float, float, float, float],
+                  time_range: Optional[tuple[str, str]] = None,
+                  time_pattern: Optional[str] = None,
+                  s2_apply_mask: bool = True,
+                  sanlc_year: Optional[int] = None,
+                  override_defaults: Optional[dict] = None,
+                  s2_as_uint16: bool = False,
+                  use_cache: bool = False,
+                  clip: bool = False,
+                  access_pattern: Optional[str] = None,
+                  dry_run: bool = False,
+                  groupby: Optional[str] = None,
+                  fuse: str = 'first'
+                  ) -> Dataset | DataArray | dict[str, Any]:
+    """
+    Loads a data product without any checks of the loading parameters. See
+    `load_product` for a description of the parameters.
+    """
+    from sdc import _cache, _profiling
+    from sdc.vec import get_site_bounds
+    import sdc.products as prod
+    from sdc.products import _ancillary as anc
+    from sdc.products import _chunks
     
     # `bbox`-parameter of `odc.stac.load` needs to be in lat/lon!
     crs = 4326
+    geometry = None
     if isinstance(vec, list):
         bounds = tuple(vec)
     elif isinstance(vec, (Path, str)):
@@ -97,37 +201,300 @@ def load_product(product: str,
                     "your workflow before scaling up.")
             bounds = get_site_bounds(site=vec.lower(), crs=crs)
         else:
-            vec_gdf = gpd.read_file(vec)
-            vec_gdf = vec_gdf.to_crs(crs)
-            bounds = tuple(vec_gdf.total_bounds)
+            with _profiling.stage('read_vector'):
+                vec_gdf = gpd.read_file(vec)
+                vec_gdf = vec_gdf.to_crs(crs)
+                bounds = tuple(vec_gdf.total_bounds)
+                if clip:
+                    geometry = shapely.union_all(vec_gdf.geometry.values)
     else:
         raise ValueError(f'Vector input {vec} not supported')
     
+    if access_pattern is not None and product in _chunks.PRODUCT_LAYOUT:
+        plan = _chunks.plan_chunks(product=product, bounds=bounds,
+                                   time_range=time_range, time_pattern=time_pattern,
+                                   access=access_pattern,
+                                   override_defaults=override_defaults,
+                                   groupby=groupby, s2_as_uint16=s2_as_uint16)
+        override_defaults = {**(override_defaults or {}), 'chunks': plan['chunks']}
+    
+    if dry_run:
+        return _chunks.estimate_load(product=product, bounds=bounds,
+                                     time_range=time_range, time_pattern=time_pattern,
+                                     override_defaults=override_defaults,
+                                     geometry=geometry, s2_apply_mask=s2_apply_mask,
+                                     sanlc_year=sanlc_year, groupby=groupby)
+    
+    if use_cache:
+        params = anc.common_params()
+        if override_defaults is not None:
+            params = anc.override_common_params(params=params, verbose=False,
+                                                **override_defaults)
+        key = _cache.cache_key(product=product, bounds=bounds, time_range=time_range,
+                               time_pattern=time_pattern, s2_apply_mask=s2_apply_mask,
+                               s2_as_uint16=s2_as_uint16, sanlc_year=sanlc_year,
+                               params=params, groupby=groupby, fuse=fuse,
+                               geometry=None if geometry is None else geometry.wkb_hex,
+                               fingerprint=anc.catalog_fingerprint(product))
+        ds = _cache.load_cached(key)
+        if ds is not None:
+            return ds
+    
     kwargs = {'bounds': bounds,
               'time_range': time_range,
               'time_pattern': time_pattern}
     
-    if product == 's1_rtc':
-        ds = prod.load_s1_rtc(override_defaults=override_defaults, **kwargs)
-    elif product == 's1_surfmi':
-        ds = prod.load_s1_surfmi(override_defaults=override_defaults, **kwargs)
-    elif product == 's1_coh':
-        ds = prod.load_s1_coherence(override_defaults=override_defaults, **kwargs)
-    elif product == 's2_l2a':
-        ds = prod.load_s2_l2a(apply_mask=s2_apply_mask, 
-                              override_defaults=override_defaults, **kwargs)
-    elif product == 'sanlc':
-        ds = prod.load_sanlc(bounds=bounds, 
-                             year=sanlc_year, 
-                             override_defaults=override_defaults)
-    elif product == 'mswep':
-        ds = prod.load_mswep(**kwargs)
-    elif product == 'chirps':
-        ds = prod.load_chirps(**kwargs)
-    elif product == 'cop_dem':
-        ds = prod.load_copdem(bounds=bounds, 
-                              override_defaults=override_defaults)
-    else:
-        raise ValueError(f'Product {product} not supported')
+    # Catalog reading and item filtering are recorded as separate stages
+    with _profiling.stage('build_graph'):
+        if product == 's1_rtc':
+            ds = prod.load_s1_rtc(override_defaults=override_defaults,
+                                  geometry=geometry, groupby=groupby, fuse=fuse,
+                                  **kwargs)
+        elif product == 's1_surfmi':
+            ds = prod.load_s1_surfmi(override_defaults=override_defaults,
+                                     geometry=geometry, **kwargs)
+        elif product == 's1_coh':
+            ds = prod.load_s1_coherence(override_defaults=override_defaults,
+                                        geometry=geometry, **kwargs)
+        elif product == 's2_l2a':
+            ds = prod.load_s2_l2a(apply_mask=s2_apply_mask,
+                                  as_uint16=s2_as_uint16,
+                                  override_defaults=override_defaults,
+                                  geometry=geometry, groupby=groupby, fuse=fuse,
+                                  **kwargs)
+        elif product == 'sanlc':
+            ds = prod.load_sanlc(bounds=bounds, 
+                                 year=sanlc_year, 
+                                 override_defaults=override_defaults)
+        elif product == 'mswep':
+            ds = prod.load_mswep(**kwargs)
+        elif product == 'chirps':
+            ds = prod.load_chirps(**kwargs)
+        elif product == 'cop_dem':
+            ds = prod.load_copdem(bounds=bounds, 
+                                  override_defaults=override_defaults)
+        else:
+            raise ValueError(f'Product {product} not supported')
     
+    if geometry is not None:
+        with _profiling.stage('clip'):
+            ds = anc.clip_to_geometry(ds, geometry)
+    
+    if _profiling.enabled():
+        _profiling.count('graph_tasks', len(ds.__dask_graph__() or {}))
+        _profiling.count('nbytes', ds.nbytes)
+    
+    if use_cache:
+        with _profiling.stage('write_cache'):
+            ds = _cache.store(key, ds)
     return ds
+
+
+def load_product_batch(product: str,
+                       vecs: gpd.GeoDataFrame | str | Path |
+                             list[tuple[float, float, float, float]],
+                       time_range: Optional[tuple[str, str]] = None,
+                       time_pattern: Optional[str] = None,
+                       **kwargs: Any
+                       ) -> list[Dataset | DataArray]:
+    """
+    Load a data product for many areas of interest (AOIs) at once. The product is
+    loaded lazily only once for the union of all AOIs, i.e. there is a single catalog
+    query and a single Dask graph, from which the data of each AOI is then cropped.
+    Overlapping AOIs therefore share their reads and chunks that do not intersect any
+    AOI are never read. For time series products, only time steps with STAC Items
+    intersecting an AOI are kept in its Dataset.
+    
+    Parameters
+    ----------
+    product : str
+        Product to load. See `load_product` for supported products.
+    vecs : GeoDataFrame or str or Path or list of tuple of float
+        Several options to define the AOIs:
+        - A GeoDataFrame, where each row is an AOI.
+        - Path to a vector file readable by GeoPandas, where each feature is an AOI.
+        - A list of bounding boxes in the format: (minx, miny, maxx, maxy).
+    time_range : tuple of str, optional
+        Time range to load as a tuple of strings in the form of: (start_time, stop_time)
+        , where start_time and stop_time are strings in the format specified by
+        `time_pattern`. Default is None, which loads all available data.
+    time_pattern : str, optional
+        Time pattern to parse the time range. Only needed if it deviates from the
+        default: '%Y-%m-%d'.
+    **kwargs : Any
+        Additional keyword arguments passed to `load_product`.
+    
+    Returns
+    -------
+    list of Dataset or DataArray
+        A list of lazily loaded Xarray Datasets or DataArrays, one for each AOI in the
+        order of `vecs`.
+    
+    Examples
+    --------
+    >>> import dask
+    >>> from sdc.load import load_product_batch
+    
+    >>> ds_list = load_product_batch(product='s1_rtc', vecs='path/to/fields.geojson',
+    ...                              time_range=('2020-01-01', '2021-01-01'))
+    >>> # Compute all AOIs with a single submission to the cluster
+    >>> ds_list = dask.compute(*[ds.vv.mean(dim=['latitude', 'longitude'])
+    ...                          for ds in ds_list])
+    """
+    from odc.geo.geom import box
+    
+    if isinstance(vecs, (str, Path)):
+        vecs = gpd.read_file(vecs)
+    if isinstance(vecs, gpd.GeoDataFrame):
+        bounds = vecs.to_crs(4326).bounds.values
+    else:
+        bounds = np.asarray(vecs, dtype='float64').reshape(-1, 4)
+    
+    union = [float(bounds[:, 0].min()), float(bounds[:, 1].min()),
+             float(bounds[:, 2].max()), float(bounds[:, 3].max())]
+    ds = load_product(product=product, vec=union, time_range=time_range,
+                      time_pattern=time_pattern, **kwargs)
+    ds_list = [ds.odc.crop(box(*b, crs='EPSG:4326'), apply_mask=False)
+               for b in bounds]
+    
+    if product in ['s1_rtc', 's1_surfmi', 's1_coh', 's2_l2a']:
+        groupby = kwargs.get('groupby') if product in ['s1_rtc', 's2_l2a'] else None
+        aoi_times = _aoi_times(product=product, bounds=bounds, time_range=time_range,
+                               time_pattern=time_pattern, groupby=groupby,
+                               lon=(union[0] + union[2]) / 2)
+        ds_list = [_ds.sel(time=np.isin(_ds.time.values, times))
+                   for _ds, times in zip(ds_list, aoi_times)]
+    return ds_list
+
+
+def _aoi_times(product: str,
+               bounds: np.ndarray,
+               time_range: Optional[tuple[str, str]] = None,
+               time_pattern: Optional[str] = None,
+               groupby: Optional[str] = None,
+               lon: Optional[float] = None
+               ) -> list[np.ndarray]:
+    """
+    Get the times of all time steps of a time series product with STAC Items that
+    intersect each of the given bounding boxes. If the STAC Items are grouped while
+    loading, the time of a time step is the datetime of its earliest STAC Item.
+    """
+    from sdc.products import _ancillary as anc
+    from sdc.products import _mosaic as mosaic
+    from sdc.products import _query as query
+    
+    catalog = anc.get_catalog(product=anc.PRODUCT_CATALOGS[product][-1])
+    _, items = query.filter_stac_catalog(catalog=catalog, bbox=bounds,
+                                         time_range=time_range,
+                                         time_pattern=time_pattern)
+    item_bboxes = np.array([item.bbox[:2] + item.bbox[-2:] if item.bbox is not None
+                            else [-180, -90, 180, 90] for item in items],
+                           dtype='float64').reshape(-1, 4)
+    codes, times = mosaic.group_items(items, groupby=groupby, lon=lon)
+    item_times = times[codes]
+    hits = query.intersecting_bboxes(bounds, item_bboxes)
+    return [np.unique(item_times[hit]) for hit in hits]
+
+
+def iter_product(product: str,
+                 vec: str | Path | list[float, float, float, float],
+                 time_range: Optional[tuple[str, str]] = None,
+                 time_pattern: Optional[str] = None,
+                 by: str = 'time',
+                 prefetch: int = 1,
+                 override_defaults: Optional[dict] = None,
+                 **kwargs: Any
+                 ) -> Iterator[Dataset | DataArray]:
+    """
+    Iterate over a data product one acquisition (or one day) at a time. Only the
+    current time slice is held in memory, while the next `prefetch` time slices are
+    already being computed in the background on the Dask cluster. This is useful for
+    per-scene processing of long time series, which would otherwise need to hold the
+    entire time axis of each spatial chunk in memory.
+    
+    The product is loaded with the same item filtering and masking as
+    `load_product`, but chunked with a single time step per chunk, so that each time
+    slice only reads the STAC Items of its own acquisition(s).
+    
+    Parameters
+    ----------
+    product : str
+        Product to load. See `load_product` for supported products.
+    vec : str or Path or list of float
+        The spatial extent of the data to load. See `load_product` for details.
+    time_range : tuple of str, optional
+        Time range to load as a tuple of strings in the form of: (start_time, stop_time)
+        , where start_time and stop_time are strings in the format specified by
+        `time_pattern`. Default is None, which loads all available data.
+    time_pattern : str, optional
+        Time pattern to parse the time range. Only needed if it deviates from the
+        default: '%Y-%m-%d'.
+    by : str, optional
+        How to slice the time axis. Can be either 'time' (default), which yields each
+        acquisition separately, or 'day', which yields all acquisitions of the same
+        (UTC) day together, e.g. adjacent slices of the same overpass.
+    prefetch : int, optional
+        Number of time slices to compute ahead in the background. Default is 1. Set to
+        0 to disable prefetching.
+    override_defaults : dict, optional
+        Dictionary of loading parameters to override the default parameters with. See
+        `load_product` for details. The chunk size of the time dimension is always set
+        to 1.
+    **kwargs : Any
+        Additional keyword arguments passed to `load_product`, e.g. `s2_apply_mask` or
+        `clip`.
+    
+    Yields
+    ------
+    Dataset or DataArray
+        The computed data of each time slice. The time dimension is kept, so that a
+        time slice of `by='day'` can contain several acquisitions. Products without a
+        time dimension are yielded as a whole.
+    
+    Examples
+    --------
+    >>> from sdc.load import iter_product
+    
+    >>> for ds in iter_product(product='s2_l2a', vec='site06',
+    ...                        time_range=('2020-01-01', '2021-01-01')):
+    ...     ndvi = (ds.B08 - ds.B04) / (ds.B08 + ds.B04)
+    """
+    from collections import deque
+    from sdc import get_client
+    from sdc.products import _ancillary as anc
+    
+    if by not in ['time', 'day']:
+        raise ValueError(f"`by` needs to be either 'time' or 'day', not '{by}'")
+    
+    client = get_client()
+    if override_defaults is not None:
+        _warn_override_defaults(product)
+        override_defaults = dict(override_defaults)
+    else:
+        override_defaults = {}
+    chunks = anc.common_params()['chunks']
+    chunks.update(override_defaults.get('chunks', {}))
+    chunks['time'] = 1
+    override_defaults['chunks'] = chunks
+    
+    ds = _load_product(product=product, vec=vec, time_range=time_range,
+                       time_pattern=time_pattern, override_defaults=override_defaults,
+                       **kwargs)
+    if 'time' not in ds.dims:
+        yield client.compute(ds).result()
+        return
+    
+    times = ds.time.values
+    if by == 'day':
+        times = times.astype('datetime64[D]')
+    splits = np.flatnonzero(times[1:] != times[:-1]) + 1
+    slices = [slice(start, stop) for start, stop in
+              zip(np.r_[0, splits], np.r_[splits, len(times)])]
+    
+    queue = deque()
+    for time_slice in slices:
+        queue.append(client.compute(ds.isel(time=time_slice)))
+        if len(queue) > prefetch:
+            yield queue.popleft().result()
+    while queue:
+        yield queue.popleft().result()
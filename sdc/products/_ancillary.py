@@ -1,9 +1,38 @@
 from copy import deepcopy
 from pathlib import Path
+from datetime import timezone
+import os
+import json
+import hashlib
 import inspect
+import numpy as np
+import dask.array as da
+from dask.base import tokenize
+from dask.highlevelgraph import HighLevelGraph
 
-from typing import Any
+from typing import Any, Callable, Optional
+from numpy import ndarray
 from pystac import Catalog, Collection, Item
+from shapely.geometry.base import BaseGeometry
+from xarray import Dataset, DataArray
+
+from sdc import _profiling
+
+
+DEFAULT_DATA_ROOT = Path("/geonfs/02_vol3/SaldiDataCube/original_data")
+
+
+def get_data_root() -> Path:
+    """
+    Gets the root directory of the SALDi Data Cube, which contains a directory per
+    product. It can be configured with the `SDC_DATA_ROOT` environment variable (e.g.
+    to use a local copy or synthetic data). Defaults to
+    `/geonfs/02_vol3/SaldiDataCube/original_data`.
+    """
+    value = os.getenv("SDC_DATA_ROOT")
+    if value is None or value.strip() == "":
+        return DEFAULT_DATA_ROOT
+    return Path(value)
 
 
 def get_catalog_path(product: str) -> str | Path:
@@ -21,7 +50,7 @@ def get_catalog_path(product: str) -> str | Path:
         The path to the STAC Catalog file of a given product or the path to the product
          directory if product is 'MSWEP'.
     """
-    base_path = Path("/geonfs/02_vol3/SaldiDataCube/original_data")
+    base_path = get_data_root()
     _dir = base_path.joinpath(product.upper())
     _file = _dir.joinpath("catalog.json")
     if not _dir.exists():
@@ -36,6 +65,186 @@ def get_catalog_path(product: str) -> str | Path:
         return str(_file)
 
 
+PRODUCT_CATALOGS = {'s1_rtc': ['s1_rtc'],
+                    's1_surfmi': ['s1_smi_2', 's1_rtc'],
+                    's1_coh': ['s1_coh_2'],
+                    's2_l2a': ['s2_l2a'],
+                    'sanlc': ['sanlc_2'],
+                    'mswep': ['mswep'],
+                    'chirps': ['chirps'],
+                    'cop_dem': ['cop_dem']}
+
+
+# STAC Item properties that are added as coordinates along the time dimension (see
+# `assign_item_properties`)
+S1_ITEM_PROPERTIES = ['platform', 'sat:orbit_state', 'sat:relative_orbit',
+                      'sat:absolute_orbit']
+S2_ITEM_PROPERTIES = ['platform', 'sat:relative_orbit', 's2:datatake_id']
+
+
+_CATALOG_CACHE: dict[str, tuple[float, Catalog]] = {}
+_COLLECTION_CACHE: dict[str, tuple[float, Collection]] = {}
+_CHILD_HREFS_CACHE: dict[str, tuple[float, list[str]]] = {}
+_INDEX_CACHE: dict[tuple[str, Optional[str]], tuple[float, Path]] = {}
+
+
+def get_catalog(product: str) -> Catalog:
+    """
+    Gets the STAC Catalog of a given product. Parsed STAC Catalogs (including all
+    STAC Collections and STAC Items resolved from them later on) are cached per process
+    and only re-read if the modification time of the STAC Catalog file has changed.
+    Use `clear_catalog_cache` to invalidate the cache explicitly.
+    
+    Parameters
+    ----------
+    product : str
+        Name of the data product.
+    
+    Returns
+    -------
+    Catalog
+        The STAC Catalog of the product.
+    """
+    path = str(get_catalog_path(product=product))
+    mtime = os.stat(path).st_mtime
+    cached = _CATALOG_CACHE.get(path)
+    if cached is None or cached[0] != mtime:
+        with _profiling.stage('read_catalog'):
+            _CATALOG_CACHE[path] = (mtime, Catalog.from_file(path))
+    return _CATALOG_CACHE[path][1]
+
+
+def get_collection(href: str,
+                   mtime: Optional[float] = None
+                   ) -> Collection:
+    """
+    Gets a STAC Collection from a file. Parsed STAC Collections are cached per process
+    and only re-read if the modification time of the file has changed. Use
+    `clear_catalog_cache` to invalidate the cache explicitly.
+    
+    Parameters
+    ----------
+    href : str
+        Path to the STAC Collection file.
+    mtime : float, optional
+        The modification time of the file, if already known. Defaults to None, which
+        will read the modification time from the file system.
+    
+    Returns
+    -------
+    Collection
+        The STAC Collection.
+    """
+    if mtime is None:
+        mtime = os.stat(href).st_mtime
+    cached = _COLLECTION_CACHE.get(href)
+    if cached is None or cached[0] != mtime:
+        _COLLECTION_CACHE[href] = (mtime, Collection.from_file(href))
+    return _COLLECTION_CACHE[href][1]
+
+
+def get_index(catalog_path: str | Path,
+              index_path: Optional[str | Path],
+              update: Callable[[str | Path, Optional[str | Path]], Path]
+              ) -> Path:
+    """
+    Gets the item index of a STAC Catalog (see `sdc.products._index`). Like parsed STAC
+    Catalogs, index updates are cached per process: the index is only updated with
+    `update` if the modification time of the STAC Catalog file has changed since the
+    last update. Use `clear_catalog_cache` to invalidate the cache explicitly.
+    
+    Parameters
+    ----------
+    catalog_path : str or Path
+        Path to the STAC Catalog file.
+    index_path : str or Path, optional
+        Path to the SQLite file of the index. None uses the default path.
+    update : callable
+        Function that creates or updates the index from the STAC Catalog file and the
+        index path and returns the path of the index.
+    
+    Returns
+    -------
+    Path
+        Path to the SQLite file of the index.
+    """
+    key = (str(catalog_path), None if index_path is None else str(index_path))
+    mtime = os.stat(catalog_path).st_mtime
+    cached = _INDEX_CACHE.get(key)
+    if cached is None or cached[0] != mtime:
+        with _profiling.stage('update_index'):
+            _INDEX_CACHE[key] = (mtime, update(catalog_path, index_path))
+    return _INDEX_CACHE[key][1]
+
+
+def clear_catalog_cache() -> None:
+    """
+    Removes all STAC Catalogs, STAC Collections and item index states from the
+    in-process cache.
+    """
+    _CATALOG_CACHE.clear()
+    _COLLECTION_CACHE.clear()
+    _CHILD_HREFS_CACHE.clear()
+    _INDEX_CACHE.clear()
+
+
+def get_child_hrefs(catalog_path: str | Path) -> list[str]:
+    """
+    Reads the absolute hrefs of all child links from a STAC Catalog file without
+    parsing the children themselves. The hrefs are cached per process and only re-read
+    if the modification time of the STAC Catalog file has changed.
+    
+    Parameters
+    ----------
+    catalog_path : str or Path
+        Path to the STAC Catalog file.
+    
+    Returns
+    -------
+    list of str
+        A list of absolute paths to the children of the STAC Catalog.
+    """
+    key = str(catalog_path)
+    mtime = os.stat(catalog_path).st_mtime
+    cached = _CHILD_HREFS_CACHE.get(key)
+    if cached is None or cached[0] != mtime:
+        catalog_path = Path(catalog_path).resolve()
+        with open(catalog_path) as f:
+            catalog = json.load(f)
+        hrefs = [str(catalog_path.parent.joinpath(link['href']).resolve())
+                 for link in catalog.get('links', []) if link.get('rel') == 'child']
+        _CHILD_HREFS_CACHE[key] = (mtime, hrefs)
+    return list(_CHILD_HREFS_CACHE[key][1])
+
+
+def catalog_fingerprint(product: str) -> str:
+    """
+    Creates a fingerprint of the on-disk state of all STAC Catalogs (or data
+    directories) a product is loaded from. The fingerprint changes whenever the STAC
+    Catalog file, one of its child STAC Collection files or one of the data files in
+    the directory is modified.
+    
+    Parameters
+    ----------
+    product : str
+        Name of the data product as used by `sdc.load.load_product`.
+    
+    Returns
+    -------
+    str
+        A hash of the modification times of all relevant files.
+    """
+    state = []
+    for catalog in PRODUCT_CATALOGS[product]:
+        path = Path(get_catalog_path(product=catalog))
+        if path.is_dir():
+            files = sorted(path.iterdir())
+        else:
+            files = [path] + [Path(href) for href in get_child_hrefs(path)]
+        state.extend((str(f), os.stat(f).st_mtime) for f in files)
+    return hashlib.sha1(json.dumps(state).encode()).hexdigest()
+
+
 def common_params() -> dict[str, Any]:
     """
     Returns parameters common to all products.
@@ -95,6 +304,198 @@ def override_common_params(params: dict[str, Any],
     return params
 
 
+def band_params(params: dict[str, Any],
+                band_cfg: dict[str, dict[str, Any]]
+                ) -> dict[str, Any]:
+    """
+    Adds per-band data type, nodata value and resampling method to the parameters of
+    `odc.stac.load`, so that bands with different settings can be loaded in a single
+    pass. Data type and nodata value are provided via the `stac_cfg` parameter, which
+    takes precedence over the metadata of the STAC Items. An existing `stac_cfg`
+    parameter (e.g. from `override_defaults`) is merged with the per-band settings and
+    takes precedence over them.
+    
+    Parameters
+    ----------
+    params : dict
+        Dictionary of loading parameters, e.g. as returned by `common_params`.
+    band_cfg : dict
+        Dictionary mapping band names to a dictionary with the keys 'dtype', 'nodata'
+        and optionally 'resampling'. Bands without a 'resampling' key use the
+        resampling method of `params`.
+    
+    Returns
+    -------
+    dict
+        A copy of `params` with per-band `resampling` and `stac_cfg` parameters.
+    """
+    params = params.copy()
+    resampling = params.get('resampling')
+    
+    def _resampling(band: str) -> str | None:
+        if 'resampling' in band_cfg[band]:
+            return band_cfg[band]['resampling']
+        if isinstance(resampling, dict):
+            return resampling.get(band, resampling.get('*'))
+        return resampling
+    
+    params['resampling'] = {band: _resampling(band) for band in band_cfg}
+    stac_cfg = {'*': {'assets': {band: {'data_type': cfg['dtype'],
+                                        'nodata': cfg['nodata']}
+                                 for band, cfg in band_cfg.items()}}}
+    params['stac_cfg'] = _merge_dicts(stac_cfg, params.get('stac_cfg') or {})
+    return params
+
+
+def _merge_dicts(base: dict[str, Any],
+                 update: dict[str, Any]
+                 ) -> dict[str, Any]:
+    """Recursively merges two dictionaries. Values of `update` take precedence."""
+    merged = base.copy()
+    for key, val in update.items():
+        if isinstance(val, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge_dicts(merged[key], val)
+        else:
+            merged[key] = val
+    return merged
+
+
+def assign_item_properties(ds: Dataset,
+                           items: list[Item],
+                           properties: list[str]
+                           ) -> Dataset:
+    """
+    Adds properties of the loaded STAC Items (e.g. orbit or datatake) as coordinates
+    along the time dimension. Each time step gets the properties of the (first) STAC
+    Item with the same datetime. Properties that are missing for any time step are
+    skipped.
+    
+    Parameters
+    ----------
+    ds : Dataset
+        The Dataset loaded from the STAC Items.
+    items : list of Item
+        The STAC Items the Dataset was loaded from.
+    properties : list of str
+        Names of the STAC Item properties to add, e.g. 'sat:relative_orbit'.
+    
+    Returns
+    -------
+    Dataset
+        The Dataset with an additional coordinate per property.
+    """
+    if ('time' not in ds.dims or len(items) == 0 or
+            any(item.datetime is None for item in items)):
+        return ds
+    
+    item_times = np.array([np.datetime64(_naive_utc(item.datetime), 'ns')
+                           for item in items])
+    order = np.argsort(item_times, kind='stable')
+    item_times = item_times[order]
+    
+    # Match each time step to the closest STAC Item (odc-stac may truncate the
+    # datetimes of the STAC Items to a coarser precision)
+    times = ds.time.values.astype('datetime64[ns]')
+    pos = np.searchsorted(item_times, times)
+    lower = np.clip(pos - 1, 0, len(item_times) - 1)
+    upper = np.clip(pos, 0, len(item_times) - 1)
+    pos = np.where(np.abs(times - item_times[lower]) <= np.abs(item_times[upper] - times),
+                   lower, upper)
+    matched = np.abs(times - item_times[pos]) <= np.timedelta64(1, 's')
+    if not matched.all():
+        return ds
+    
+    coords = {}
+    for prop in properties:
+        values = [items[order[i]].properties.get(prop) for i in pos]
+        if any(value is None for value in values):
+            continue
+        coords[prop] = ('time', np.asarray(values))
+    return ds.assign_coords(coords)
+
+
+def _naive_utc(dt: Any) -> Any:
+    """Converts a timezone-aware datetime object to a naive datetime object in UTC."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def clip_to_geometry(ds: Dataset | DataArray,
+                     geometry: BaseGeometry
+                     ) -> Dataset | DataArray:
+    """
+    Masks a lazily loaded Dataset or DataArray to a geometry block by block. Spatial
+    chunks that do not intersect the geometry are replaced by chunks filled with the
+    nodata value (or NaN for floating point data), so that the underlying data of
+    these chunks is never read. Chunks fully covered by the geometry are passed
+    through unchanged and only chunks on its boundary are rasterized and masked.
+    
+    Parameters
+    ----------
+    ds : Dataset or DataArray
+        The data to mask. Spatial dimensions need to be the last two dimensions of
+        each variable.
+    geometry : BaseGeometry
+        The geometry of the area of interest in EPSG:4326.
+    
+    Returns
+    -------
+    Dataset or DataArray
+        The masked data.
+    """
+    from odc.geo.geom import Geometry
+    
+    if isinstance(ds, Dataset):
+        return ds.map(clip_to_geometry, geometry=geometry, keep_attrs=True)
+    
+    geobox = ds.odc.geobox
+    if geobox is None or tuple(ds.dims[-2:]) != tuple(ds.odc.spatial_dims):
+        return ds
+    geom = Geometry(geometry, crs='EPSG:4326').to_crs(geobox.crs)
+    
+    nodata = ds.attrs.get('nodata', ds.attrs.get('_FillValue'))
+    if nodata is None:
+        nodata = np.nan if np.issubdtype(ds.dtype, np.floating) else 0
+    fill = np.asarray(nodata, dtype=ds.dtype)
+    
+    if not isinstance(ds.data, da.Array):
+        return ds.copy(data=_mask_block(ds.values, geom, geobox, fill))
+    
+    data = ds.data
+    y_off, x_off = [np.cumsum((0,) + c) for c in data.chunks[-2:]]
+    name = f"clip-{tokenize(data, geom.wkt, str(geobox.crs))}"
+    dsk = {}
+    for idx in np.ndindex(*data.numblocks):
+        i, j = idx[-2:]
+        block_geobox = geobox[y_off[i]:y_off[i + 1], x_off[j]:x_off[j + 1]]
+        if geom.contains(block_geobox.extent):
+            dsk[(name, *idx)] = (data.name, *idx)
+        elif geom.intersects(block_geobox.extent):
+            dsk[(name, *idx)] = (_mask_block, (data.name, *idx), geom,
+                                 block_geobox, fill)
+        else:
+            shape = tuple(c[k] for c, k in zip(data.chunks, idx))
+            dsk[(name, *idx)] = (np.full, shape, fill, data.dtype)
+    graph = HighLevelGraph.from_collections(name, dsk, dependencies=[data])
+    return ds.copy(data=da.Array(graph, name, chunks=data.chunks, dtype=data.dtype))
+
+
+def _mask_block(data: ndarray,
+                geom: Any,
+                geobox: Any,
+                fill: ndarray
+                ) -> ndarray:
+    """
+    Sets all pixels of a block outside of a geometry to a fill value. Pixels touched by
+    the geometry are considered inside.
+    """
+    from odc.geo.xr import rasterize
+    
+    mask = rasterize(geom, geobox, all_touched=True).values
+    return np.where(mask, data, fill)
+
+
 def convert_asset_hrefs(list_stac_obj: list[Catalog | Collection | Item],
                         href_type: str
                         ) -> list[Catalog | Collection | Item] | list[None]:
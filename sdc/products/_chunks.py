@@ -0,0 +1,463 @@
+import math
+import numpy as np
+
+from typing import Any, Optional
+from shapely.geometry.base import BaseGeometry
+
+from sdc.products import _ancillary as anc
+from sdc.products import _mosaic as mosaic
+from sdc.products import _query as query
+
+
+# Number of bands and data type of the loaded data of each product
+PRODUCT_LAYOUT = {
+    's1_rtc': (4, 'float32'),
+    's1_surfmi': (1, 'float32'),
+    's1_coh': (1, 'float32'),
+    's2_l2a': (12, 'float32'),
+    'sanlc': (1, 'uint8'),
+    'cop_dem': (1, 'float32'),
+}
+
+# Factor between the size of a chunk and the memory a task needs to process it
+# (input chunks, intermediate results and output chunks)
+MEMORY_FACTOR = 8
+MIN_CHUNK_BYTES = 16 * 1024**2
+MAX_CHUNK_BYTES = 256 * 1024**2
+SPATIAL_ALIGN = 256  # spatial chunk sizes are multiples of this (in pixels)
+
+ACCESS_PATTERNS = ['timeseries', 'spatial']
+
+# Bands (and their data types) loaded from each STAC Catalog of a product
+S2_BANDS = ['B02', 'B03', 'B04', 'B05', 'B06', 'B07', 'B08', 'B8A', 'B09', 'B11',
+            'B12']
+PRODUCT_BANDS = {
+    's1_rtc': {'s1_rtc': {'vv': 'float32', 'vh': 'float32', 'area': 'float32',
+                          'angle': 'uint8'}},
+    's1_surfmi': {'s1_smi_2': {'vv_q05': 'float32', 'vv_q95': 'float32'},
+                  's1_rtc': {'vv': 'float32'}},
+    's1_coh': {'s1_coh_2': {'coh_vv': 'float32'}},
+    's2_l2a': {'s2_l2a': {**{band: 'uint16' for band in S2_BANDS}, 'SCL': 'uint8'}},
+    'sanlc': {'sanlc_2': {'asset': 'uint8'}},
+    'cop_dem': {'cop_dem': {'elevation': 'float32'}},
+}
+
+# STAC Catalogs of each product whose STAC Items are filtered by time range (and
+# geometry) when loading. STAC Items of all other catalogs are only filtered by bbox.
+TIME_SERIES_CATALOGS = {
+    's1_rtc': ['s1_rtc'],
+    's1_surfmi': ['s1_rtc'],
+    's1_coh': ['s1_coh_2'],
+    's2_l2a': ['s2_l2a'],
+}
+
+# Resolution (in degrees) of the products that are not loaded via STAC
+GRID_RESOLUTION = {'mswep': 0.1, 'chirps': 0.05}
+
+
+def worker_resources() -> tuple[int, int]:
+    """
+    Gets the memory (in bytes) and the number of threads of a single Dask worker from
+    the SLURM configuration returned by `sdc._cluster.get_slurm_config`.
+    
+    Returns
+    -------
+    memory : int
+        Memory of a single worker in bytes.
+    threads : int
+        Number of threads of a single worker.
+    """
+    from dask.utils import parse_bytes
+    from sdc._cluster import get_slurm_config
+    
+    cfg = get_slurm_config()
+    processes = max(cfg['processes'], 1)
+    memory = parse_bytes(cfg['memory']) // processes
+    threads = max(cfg['cores'] // processes, 1)
+    return memory, threads
+
+
+def target_chunk_bytes(worker_memory: Optional[int] = None,
+                       threads: Optional[int] = None
+                       ) -> int:
+    """
+    Gets the target size of a chunk, so that all threads of a worker can process a
+    chunk at the same time without exceeding the memory of the worker.
+    
+    Parameters
+    ----------
+    worker_memory : int, optional
+        Memory of a single worker in bytes. Defaults to None, which uses the memory
+        returned by `worker_resources`.
+    threads : int, optional
+        Number of threads of a single worker. Defaults to None, which uses the number
+        returned by `worker_resources`.
+    
+    Returns
+    -------
+    int
+        The target chunk size in bytes.
+    """
+    if worker_memory is None or threads is None:
+        _memory, _threads = worker_resources()
+        worker_memory = _memory if worker_memory is None else worker_memory
+        threads = _threads if threads is None else threads
+    target = worker_memory / (threads * MEMORY_FACTOR)
+    return int(np.clip(target, MIN_CHUNK_BYTES, MAX_CHUNK_BYTES))
+
+
+def suggest_chunks(shape: tuple[int, int, int],
+                   dtype: str,
+                   access: str = 'timeseries',
+                   target_bytes: Optional[int] = None
+                   ) -> tuple[int, int, int]:
+    """
+    Suggests a chunk shape for data of a given shape and data type.
+    
+    Parameters
+    ----------
+    shape : tuple of int
+        Shape of the data in the format (time, y, x).
+    dtype : str
+        Data type of the data.
+    access : str, optional
+        The intended access pattern. Either 'timeseries' (default), which keeps the
+        whole time axis in a chunk as long as spatial chunks of at least
+        `SPATIAL_ALIGN` pixels can be kept, or 'spatial', which uses a single time
+        step per chunk and large spatial chunks.
+    target_bytes : int, optional
+        Target size of a chunk in bytes. Defaults to None, which uses the size returned
+        by `target_chunk_bytes`.
+    
+    Returns
+    -------
+    tuple of int
+        The chunk shape in the format (time, y, x).
+    """
+    if access not in ACCESS_PATTERNS:
+        raise ValueError(f"Access pattern '{access}' is not supported. Choose one of "
+                         f"{ACCESS_PATTERNS}.")
+    if target_bytes is None:
+        target_bytes = target_chunk_bytes()
+    n_time, ny, nx = [max(int(n), 1) for n in shape]
+    itemsize = np.dtype(dtype).itemsize
+    
+    if access == 'spatial':
+        ct = 1
+    else:
+        ct = n_time
+        min_pixels = min(SPATIAL_ALIGN**2, ny * nx)
+        if ct * min_pixels * itemsize > target_bytes:
+            ct = max(1, target_bytes // (min_pixels * itemsize))
+    
+    pixels = max(target_bytes // (ct * itemsize), 1)
+    side = max(SPATIAL_ALIGN, math.isqrt(pixels) // SPATIAL_ALIGN * SPATIAL_ALIGN)
+    cy = min(ny, side)
+    cx = max(SPATIAL_ALIGN, pixels // cy // SPATIAL_ALIGN * SPATIAL_ALIGN)
+    cx = min(nx, cx)
+    return int(ct), int(cy), int(cx)
+
+
+def plan_chunks(product: str,
+                bounds: tuple[float, float, float, float],
+                time_range: Optional[tuple[str, str]] = None,
+                time_pattern: Optional[str] = None,
+                access: str = 'timeseries',
+                override_defaults: Optional[dict] = None,
+                verbose: bool = True,
+                groupby: Optional[str] = None,
+                s2_as_uint16: bool = False
+                ) -> dict[str, Any]:
+    """
+    Plans the chunk shape for loading a product based on the number of acquisitions,
+    the pixel dimensions of the area of interest, the data type of the product, the
+    intended access pattern and the memory of the Dask workers. The chunk shape is
+    meant to be used directly by `odc.stac.load`, so that no rechunking is needed
+    after loading.
+    
+    Parameters
+    ----------
+    product : str
+        Name of the data product. See `PRODUCT_LAYOUT` for supported products.
+    bounds : tuple of float
+        The bounding box of the area of interest in the format (minx, miny, maxx, maxy).
+    time_range : tuple of str, optional
+        The time range in the format (start_time, end_time) to filter STAC Items by.
+    time_pattern : str, optional
+        Time pattern to parse the time range. Only needed if it deviates from the
+        default: '%Y-%m-%d'.
+    access : str, optional
+        The intended access pattern. Either 'timeseries' (default) or 'spatial'. See
+        `suggest_chunks` for details.
+    override_defaults : dict, optional
+        Dictionary of loading parameters overriding the default parameters, e.g. to
+        take a different resolution into account.
+    verbose : bool, optional
+        Whether to print a summary of the plan. Default is True.
+    groupby : str, optional
+        How the STAC Items are grouped into time steps while loading (see
+        `sdc.products._mosaic.group_items`). Default is None, which groups by time.
+    s2_as_uint16 : bool, optional
+        Whether the Sentinel-2 L2A product is kept as scaled integers (uint16) instead
+        of float32 reflectance values. Default is False. This parameter will be ignored
+        if `product` is not `s2_l2a`.
+    
+    Returns
+    -------
+    dict
+        Dictionary with the following keys:
+        - chunks: The chunks to pass to `odc.stac.load`.
+        - shape: The estimated shape of the data in the format (time, y, x).
+        - n_chunks: The number of chunks per band.
+        - n_tasks: A rough estimate of the number of tasks needed for loading.
+        - chunk_bytes: The size of a single chunk in bytes.
+        - total_bytes: The size of the entire data in bytes.
+        - worker_bytes: The estimated peak memory of a worker in bytes.
+        - worker_memory: The memory of a worker in bytes.
+    """
+    from odc.geo.geobox import GeoBox
+    from odc.geo.geom import BoundingBox
+    
+    if product not in PRODUCT_LAYOUT:
+        raise ValueError(f"Chunk planning is not supported for product '{product}'.")
+    n_bands, dtype = PRODUCT_LAYOUT[product]
+    if product == 's2_l2a' and s2_as_uint16:
+        dtype = 'uint16'
+    
+    params = anc.common_params()
+    if override_defaults is not None:
+        params = anc.override_common_params(params=params, verbose=False,
+                                            **override_defaults)
+    bbox = BoundingBox(*bounds, crs='EPSG:4326').to_crs(params['crs'])
+    geobox = GeoBox.from_bbox(bbox, crs=params['crs'],
+                              resolution=params['resolution'])
+    ny, nx = geobox.shape
+    
+    catalog = anc.get_catalog(product=anc.PRODUCT_CATALOGS[product][-1])
+    _, items = query.filter_stac_catalog(catalog=catalog, bbox=bounds,
+                                         time_range=time_range,
+                                         time_pattern=time_pattern)
+    n_items = len(items)
+    if product not in ['s1_rtc', 's2_l2a']:
+        groupby = None
+    n_time = _count_time_steps(items, bounds=bounds, groupby=groupby) or 1
+    
+    worker_memory, threads = worker_resources()
+    target_bytes = target_chunk_bytes(worker_memory, threads)
+    ct, cy, cx = suggest_chunks((n_time, ny, nx), dtype, access=access,
+                                target_bytes=target_bytes)
+    
+    itemsize = np.dtype(dtype).itemsize
+    n_chunks = math.ceil(n_time / ct) * math.ceil(ny / cy) * math.ceil(nx / cx)
+    plan = {
+        'chunks': {'time': ct, 'latitude': cy, 'longitude': cx},
+        'shape': (n_time, ny, nx),
+        'n_chunks': n_chunks,
+        'n_tasks': n_bands * (n_chunks + n_items),
+        'chunk_bytes': ct * cy * cx * itemsize,
+        'total_bytes': n_bands * n_time * ny * nx * itemsize,
+        'worker_bytes': ct * cy * cx * itemsize * threads * MEMORY_FACTOR,
+        'worker_memory': worker_memory,
+    }
+    if verbose:
+        print(f"[INFO] Chunk plan for {product} ({access}): chunks={plan['chunks']}, "
+              f"shape={plan['shape']}, ~{plan['n_tasks']} tasks, "
+              f"{_format_bytes(plan['total_bytes'])} in total, "
+              f"{_format_bytes(plan['chunk_bytes'])} per chunk, "
+              f"~{_format_bytes(plan['worker_bytes'])} peak per worker "
+              f"({_format_bytes(worker_memory)} available)")
+    return plan
+
+
+def estimate_load(product: str,
+                  bounds: tuple[float, float, float, float],
+                  time_range: Optional[tuple[str, str]] = None,
+                  time_pattern: Optional[str] = None,
+                  override_defaults: Optional[dict] = None,
+                  geometry: Optional[BaseGeometry] = None,
+                  s2_apply_mask: bool = True,
+                  sanlc_year: Optional[int] = None,
+                  groupby: Optional[str] = None
+                  ) -> dict[str, Any]:
+    """
+    Estimates the cost of loading a product from the catalog query and the loading
+    parameters alone, i.e. without opening any files or reading any pixel data.
+    
+    Parameters
+    ----------
+    product : str
+        Name of the data product.
+    bounds : tuple of float
+        The bounding box of the area of interest in the format (minx, miny, maxx, maxy).
+    time_range : tuple of str, optional
+        The time range in the format (start_time, end_time) to filter STAC Items by.
+    time_pattern : str, optional
+        Time pattern to parse the time range. Only needed if it deviates from the
+        default: '%Y-%m-%d'.
+    override_defaults : dict, optional
+        Dictionary of loading parameters overriding the default parameters.
+    geometry : BaseGeometry, optional
+        A geometry of the area of interest in EPSG:4326, which is used to filter the
+        STAC Items of time series products.
+    s2_apply_mask : bool, optional
+        Whether the `SCL` band is loaded in addition to the Sentinel-2 L2A bands.
+        Default is True.
+    sanlc_year : int, optional
+        The year of the SANLC product to load. Default is None (all years).
+    groupby : str, optional
+        How the STAC Items of the Sentinel-1 RTC and Sentinel-2 L2A products are
+        grouped into time steps while loading (see `sdc.products._mosaic.group_items`).
+        Default is None, which groups by time.
+    
+    Returns
+    -------
+    dict
+        Dictionary with the following keys:
+        - product: The name of the product.
+        - n_items: The number of STAC Items (or files for MSWEP and CHIRPS).
+        - n_assets: The number of assets to read.
+        - n_files: The number of distinct files to open.
+        - shape: The shape of the output in the format (time, y, x). The number of
+          time steps is None if it cannot be derived without opening files.
+        - bands: The names of the loaded bands.
+        - total_bytes: The uncompressed size of all loaded bands in bytes.
+        - chunks: The chunk shape in the format (time, y, x).
+        - n_chunks: The number of chunks of all loaded bands.
+        - n_tasks: A rough estimate of the number of Dask tasks needed for loading.
+    """
+    from odc.geo.geobox import GeoBox
+    from odc.geo.geom import BoundingBox
+    from odc.loader import resolve_chunk_shape
+    
+    if product in GRID_RESOLUTION:
+        return _estimate_precip(product=product, bounds=bounds, time_range=time_range,
+                                time_pattern=time_pattern)
+    if product not in PRODUCT_BANDS:
+        raise ValueError(f'Product {product} not supported')
+    
+    params = anc.common_params()
+    if override_defaults is not None:
+        params = anc.override_common_params(params=params, verbose=False,
+                                            **override_defaults)
+    bbox = BoundingBox(*bounds, crs='EPSG:4326').to_crs(params['crs'])
+    geobox = GeoBox.from_bbox(bbox, crs=params['crs'],
+                              resolution=params['resolution'])
+    ny, nx = geobox.shape
+    
+    estimate = {'product': product, 'n_items': 0, 'n_assets': 0, 'n_files': 0,
+                'shape': None, 'bands': [], 'total_bytes': 0, 'chunks': None,
+                'n_chunks': 0, 'n_tasks': 0}
+    files = set()
+    for catalog_name, bands in PRODUCT_BANDS[product].items():
+        if product == 's2_l2a' and not s2_apply_mask:
+            bands = {band: dtype for band, dtype in bands.items() if band != 'SCL'}
+        is_output = catalog_name == anc.PRODUCT_CATALOGS[product][-1]
+        is_time_series = catalog_name in TIME_SERIES_CATALOGS.get(product, [])
+        catalog = anc.get_catalog(product=catalog_name)
+        _, items = query.filter_stac_catalog(
+            catalog=catalog, bbox=bounds,
+            time_range=time_range if is_time_series else None,
+            time_pattern=time_pattern if is_time_series else None,
+            geometry=geometry if is_time_series else None)
+        if product == 'sanlc' and sanlc_year is not None:
+            items = _filter_sanlc_year(items, year=sanlc_year)
+        if product in ['s1_rtc', 's2_l2a']:
+            n_time = _count_time_steps(items, bounds=bounds, groupby=groupby)
+        else:
+            n_time = len({item.datetime for item in items})
+        
+        # Chunks are resolved by odc-stac based on the largest data type of all bands
+        shape = (n_time, ny, nx)
+        dtype = max(bands.values(), key=lambda dt: np.dtype(dt).itemsize)
+        chunk_shape = resolve_chunk_shape(max(n_time, 1), geobox, params['chunks'],
+                                          dtype=dtype)
+        n_chunks = math.prod(math.ceil(n / c) for n, c in zip(shape, chunk_shape))
+        for band, dtype in bands.items():
+            hrefs = [item.assets[band].href for item in items if band in item.assets]
+            files.update(hrefs)
+            estimate['n_assets'] += len(hrefs)
+            estimate['total_bytes'] += math.prod(shape) * np.dtype(dtype).itemsize
+            estimate['n_chunks'] += n_chunks
+            estimate['n_tasks'] += n_chunks + len(hrefs)
+        estimate['n_items'] += len(items)
+        if is_output:
+            estimate['shape'] = shape
+            estimate['bands'] = list(bands)
+            estimate['chunks'] = tuple(chunk_shape)
+    estimate['n_files'] = len(files)
+    return estimate
+
+
+def _filter_sanlc_year(items: list,
+                       year: int
+                       ) -> list:
+    """
+    Selects the STAC Items of the SANLC product that are loaded for a given year,
+    i.e. those of the time step nearest to the start of the year (see
+    `sdc.products.sanlc.load_sanlc`).
+    """
+    if year not in [2018, 2020, 2022]:
+        raise ValueError('The SANLC product is only available for the years 2018, '
+                         '2020 and 2022')
+    if len(items) == 0:
+        return items
+    times = np.array([query._to_datetime64(item.datetime) for item in items],
+                     dtype='datetime64[ns]')
+    target = np.datetime64(f'{year}-01-01', 'ns')
+    nearest = times[np.argmin(np.abs(times - target))]
+    return [item for item, t in zip(items, times) if t == nearest]
+
+
+def _count_time_steps(items: list,
+                      bounds: tuple[float, float, float, float],
+                      groupby: Optional[str] = None
+                      ) -> int:
+    """Counts the time steps the STAC Items are loaded into."""
+    if len(items) == 0:
+        return 0
+    codes, _ = mosaic.group_items(items, groupby=groupby,
+                                  lon=(bounds[0] + bounds[2]) / 2)
+    return int(codes.max()) + 1
+
+
+def _estimate_precip(product: str,
+                     bounds: tuple[float, float, float, float],
+                     time_range: Optional[tuple[str, str]] = None,
+                     time_pattern: Optional[str] = None
+                     ) -> dict[str, Any]:
+    """
+    Estimates the cost of loading the MSWEP or CHIRPS product from its file names. The
+    number of time steps of MSWEP is only known if a time range is given, as each file
+    holds a variable number of days.
+    """
+    resolution = GRID_RESOLUTION[product]
+    ny = max(round((bounds[3] - bounds[1]) / resolution), 1)
+    nx = max(round((bounds[2] - bounds[0]) / resolution), 1)
+    directory = anc.get_catalog_path(product=product)
+    
+    if product == 'mswep':
+        files = query.filter_mswep_nc(directory=directory, time_range=time_range,
+                                      time_pattern=time_pattern)
+        n_time = None
+        if time_range is not None:
+            start, end = [query._timestring_to_utc_datetime(time=t,
+                                                            pattern=time_pattern)
+                          for t in time_range]
+            n_time = (end - start).days + 1
+    else:
+        files = query.filter_chirps(directory=directory, time_range=time_range,
+                                    time_pattern=time_pattern)
+        n_time = len(files)
+    
+    n_files = len(files)
+    total_bytes = None if n_time is None else n_time * ny * nx * 4
+    return {'product': product, 'n_items': n_files, 'n_assets': n_files,
+            'n_files': n_files, 'shape': (n_time, ny, nx),
+            'bands': ['precipitation'], 'total_bytes': total_bytes,
+            'chunks': None, 'n_chunks': n_files, 'n_tasks': n_files + 1}
+
+
+def _format_bytes(n: int) -> str:
+    """Formats a number of bytes as a human-readable string."""
+    from dask.utils import format_bytes
+    return format_bytes(int(n))
@@ -0,0 +1,324 @@
+import os
+import json
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import pytz
+import numpy as np
+import pystac
+
+from typing import Optional, Any, Iterator, Sequence
+from pystac import Collection, Item
+
+from sdc.products import _ancillary as anc
+from sdc.products import _query as query
+
+
+DEFAULT_INDEX_DIR = Path.home().joinpath(".cache", "sdc", "index")
+
+_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS collections (
+    id TEXT PRIMARY KEY,
+    href TEXT NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS collection_bboxes (
+    collection_id TEXT NOT NULL,
+    minx REAL, miny REAL, maxx REAL, maxy REAL
+);
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT NOT NULL,
+    collection_id TEXT NOT NULL,
+    href TEXT,
+    datetime TEXT,
+    minx REAL, miny REAL, maxx REAL, maxy REAL,
+    item_json TEXT NOT NULL,
+    PRIMARY KEY (collection_id, id)
+);
+CREATE INDEX IF NOT EXISTS idx_items_collection_datetime
+    ON items (collection_id, datetime);
+CREATE INDEX IF NOT EXISTS idx_collection_bboxes_id
+    ON collection_bboxes (collection_id);
+"""
+
+
+def get_index_path(catalog_path: str | Path) -> Path:
+    """
+    Gets the path of the item index file for a given STAC Catalog file.
+    
+    The index directory can be configured with the `SDC_INDEX_DIR` environment
+    variable. Defaults to `~/.cache/sdc/index`.
+    
+    Parameters
+    ----------
+    catalog_path : str or Path
+        Path to the STAC Catalog file.
+    
+    Returns
+    -------
+    Path
+        Path to the SQLite file holding the item index of the STAC Catalog.
+    """
+    index_dir = os.getenv("SDC_INDEX_DIR")
+    if index_dir is None or index_dir.strip() == "":
+        index_dir = DEFAULT_INDEX_DIR
+    catalog_path = Path(catalog_path).resolve()
+    digest = hashlib.sha1(str(catalog_path).encode()).hexdigest()[:12]
+    return Path(index_dir).joinpath(f"{catalog_path.parent.name}-{digest}.sqlite")
+
+
+def update_index(catalog_path: str | Path,
+                 index_path: Optional[str | Path] = None,
+                 rebuild: bool = False
+                 ) -> Path:
+    """
+    Creates or incrementally updates the item index of a STAC Catalog.
+    
+    Only the STAC Catalog file itself is parsed. A child STAC Collection (and all of
+    its STAC Items) is only re-read if the modification time of its file has changed
+    since the last update. STAC Collections that have been removed from the STAC
+    Catalog are also removed from the index.
+    
+    Note that the modification times of the STAC Item files are not checked, so
+    STAC Items that are edited or added without also updating the file of their STAC
+    Collection are not picked up. Use `rebuild=True` in this case.
+    
+    Parameters
+    ----------
+    catalog_path : str or Path
+        Path to the STAC Catalog file.
+    index_path : str or Path, optional
+        Path to the SQLite file of the index. Defaults to None, which uses the path
+        returned by `get_index_path`.
+    rebuild : bool, optional
+        Whether to discard the existing index and rebuild it from scratch. Defaults to
+        False.
+    
+    Returns
+    -------
+    Path
+        Path to the SQLite file of the index.
+    """
+    catalog_path = Path(catalog_path).resolve()
+    if index_path is None:
+        index_path = get_index_path(catalog_path)
+    index_path = Path(index_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    child_hrefs = anc.get_child_hrefs(catalog_path)
+    with _connect(index_path) as con:
+        if rebuild:
+            con.executescript("DELETE FROM items; DELETE FROM collection_bboxes; "
+                              "DELETE FROM collections;")
+        indexed = {href: (_id, mtime) for _id, href, mtime in
+                   con.execute("SELECT id, href, mtime FROM collections")}
+    
+        for href in set(indexed).difference(child_hrefs):
+            _delete_collection(con, indexed[href][0])
+    
+        for href in child_hrefs:
+            mtime = os.stat(href).st_mtime
+            if href in indexed and indexed[href][1] == mtime:
+                continue
+            if href in indexed:
+                _delete_collection(con, indexed[href][0])
+            collection = pystac.read_file(href)
+            if not isinstance(collection, Collection):
+                continue
+            _insert_collection(con, collection, href, mtime)
+    return index_path
+
+
+def filter_index(catalog_path: str | Path,
+                 bbox: Optional[tuple[float, float, float, float] |
+                                Sequence[tuple[float, float, float, float]]] = None,
+                 collection_ids: Optional[list[str]] = None,
+                 time_range: Optional[tuple[str, str]] = None,
+                 time_pattern: Optional[str] = None,
+                 index_path: Optional[str | Path] = None,
+                 lazy: bool = False
+                 ) -> tuple[list[Collection], list[Item] | Iterator[Item]]:
+    """
+    Filters the STAC Collections and STAC Items of a STAC Catalog using its item
+    index. The index is updated before querying if the STAC Catalog file has changed
+    since the last update in this process (see `sdc.products._ancillary.get_index`).
+    Only the matching STAC Collections and STAC Items are converted back to pystac
+    objects.
+    
+    Parameters
+    ----------
+    catalog_path : str or Path
+        Path to the STAC Catalog file.
+    bbox : tuple of float or sequence of tuple of float, optional
+        The bounding box of the area of interest in the format (minx, miny, maxx, maxy)
+        or a sequence of such bounding boxes.
+    collection_ids : list of str, optional
+        A list of collection IDs to filter. If not None, this will override the `bbox`
+        option.
+    time_range : tuple of str, optional
+        Time range to load as a tuple of (start_time, stop_time), where start_time and
+        stop_time are strings in the format specified by `time_pattern`. Default is
+        None, which loads all available data.
+    time_pattern : str, optional
+        Time pattern to parse the time range. Only needed if it deviates from the
+        default: '%Y-%m-%d'.
+    index_path : str or Path, optional
+        Path to the SQLite file of the index. Defaults to None, which uses the path
+        returned by `get_index_path`.
+    lazy : bool, optional
+        Whether to return the filtered items as a generator, which converts the index
+        records to STAC Items on demand. Default is False.
+    
+    Returns
+    -------
+    filtered_collections : list of Collection
+        A list of filtered collections.
+    filtered_items : list of Item or Iterator of Item
+        A list (or generator) of filtered items.
+    """
+    index_path = anc.get_index(catalog_path, index_path=index_path,
+                               update=update_index)
+    
+    with _connect(index_path) as con:
+        collections = _query_collections(con, bbox, collection_ids)
+        if len(collections) == 0:
+            return [], []
+    
+        where = [f"collection_id IN ({','.join('?' * len(collections))})"]
+        args = [_id for _id, _, _ in collections]
+        if time_range is not None:
+            start = query._timestring_to_utc_datetime(time=time_range[0],
+                                                      pattern=time_pattern)
+            end = query._timestring_to_utc_datetime(time=time_range[1],
+                                                    pattern=time_pattern)
+            where.append("datetime BETWEEN ? AND ?")
+            args.extend([_format_datetime(start), _format_datetime(end)])
+        rows = con.execute(f"SELECT item_json FROM items WHERE {' AND '.join(where)} "
+                           f"ORDER BY rowid", args).fetchall()
+    
+    filtered_collections = [anc.get_collection(href, mtime)
+                            for _, href, mtime in collections]
+    records = (row[0] for row in rows)
+    if lazy:
+        filtered_items = (items_from_records([record])[0] for record in records)
+    else:
+        filtered_items = items_from_records(list(records))
+    return filtered_collections, filtered_items
+
+
+def items_from_records(records: list[str]) -> list[Item]:
+    """
+    Converts serialized index records back to STAC Items.
+    
+    Parameters
+    ----------
+    records : list of str
+        A list of JSON-serialized STAC Items as stored in the index.
+    
+    Returns
+    -------
+    list of Item
+        A list of STAC Items with absolute asset hrefs.
+    """
+    return [Item.from_dict(json.loads(record), migrate=False) for record in records]
+
+
+@contextmanager
+def _connect(index_path: Path) -> Iterator[sqlite3.Connection]:
+    """
+    Opens a connection to the index and makes sure that the schema exists. The
+    transaction is committed (or rolled back on errors) and the connection is closed
+    when the context is left.
+    """
+    con = sqlite3.connect(index_path)
+    try:
+        with con:
+            con.executescript(_SCHEMA)
+            yield con
+    finally:
+        con.close()
+
+
+def _delete_collection(con: sqlite3.Connection,
+                       collection_id: str
+                       ) -> None:
+    """Removes a STAC Collection and all of its STAC Items from the index."""
+    con.execute("DELETE FROM items WHERE collection_id = ?", (collection_id,))
+    con.execute("DELETE FROM collection_bboxes WHERE collection_id = ?",
+                (collection_id,))
+    con.execute("DELETE FROM collections WHERE id = ?", (collection_id,))
+
+
+def _insert_collection(con: sqlite3.Connection,
+                       collection: Collection,
+                       href: str,
+                       mtime: float
+                       ) -> None:
+    """Adds a STAC Collection and all of its STAC Items to the index."""
+    con.execute("INSERT INTO collections VALUES (?, ?, ?)",
+                (collection.id, href, mtime))
+    bboxes = collection.extent.spatial.bboxes or []
+    con.executemany("INSERT INTO collection_bboxes VALUES (?, ?, ?, ?, ?)",
+                    [(collection.id, *b[:2], *b[-2:]) for b in bboxes])
+    con.executemany("INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [_item_record(item, collection.id)
+                     for item in collection.get_items()])
+
+
+def _item_record(item: Item,
+                 collection_id: str
+                 ) -> tuple[Any, ...]:
+    """Creates an index record of a STAC Item."""
+    href = item.get_self_href()
+    if href is not None:
+        item.make_asset_hrefs_absolute()
+    item_dict = item.to_dict(include_self_link=False, transform_hrefs=False)
+    item_dict['links'] = [] if href is None else [{'rel': 'self', 'href': href}]
+    
+    dt = item.datetime
+    if dt is None:
+        dt = item.common_metadata.start_datetime
+    bbox = item.bbox if item.bbox is not None else [None] * 4
+    return (item.id, collection_id, href, _format_datetime(dt),
+            *bbox[:2], *bbox[-2:], json.dumps(item_dict))
+
+
+def _query_collections(con: sqlite3.Connection,
+                       bbox: Optional[tuple[float, float, float, float] |
+                                      Sequence[tuple[float, float, float, float]]] = None,
+                       collection_ids: Optional[list[str]] = None
+                       ) -> list[tuple[str, str, float]]:
+    """
+    Gets the IDs, hrefs and modification times of all STAC Collections matching the
+    filters.
+    """
+    if collection_ids is not None:
+        collection_ids = list(collection_ids)
+        return con.execute(f"SELECT id, href, mtime FROM collections WHERE id IN "
+                           f"({','.join('?' * len(collection_ids))}) ORDER BY rowid",
+                           collection_ids).fetchall()
+    elif bbox is not None:
+        rows = con.execute("SELECT collection_id, minx, miny, maxx, maxy "
+                           "FROM collection_bboxes").fetchall()
+        extents = np.asarray([row[1:] for row in rows], dtype='float64')
+        hits = query.intersecting_bboxes(bbox, extents).any(axis=0)
+        matched = {rows[i][0] for i in np.flatnonzero(hits)}
+        return [row for row in
+                con.execute("SELECT id, href, mtime FROM collections ORDER BY rowid")
+                if row[0] in matched]
+    else:
+        return con.execute("SELECT id, href, mtime FROM collections "
+                           "ORDER BY rowid").fetchall()
+
+
+def _format_datetime(dt: Optional[datetime]) -> Optional[str]:
+    """Formats a datetime object as a lexicographically sortable UTC string."""
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=pytz.UTC)
+    return dt.astimezone(pytz.UTC).strftime(_DATETIME_FORMAT)
@@ -0,0 +1,265 @@
+from functools import partial
+import numpy as np
+import pandas as pd
+
+from typing import Any, Callable, Optional
+from numpy import ndarray
+from pystac import Item
+from xarray import DataArray, Dataset
+import xarray as xr
+
+from sdc.products import _query as query
+
+
+# Modes of grouping STAC Items into time steps while loading
+GROUPBY_MODES = ['time', 'solar_day', 'datatake']
+
+# Methods of fusing overlapping pixels of the STAC Items of a time step
+FUSE_METHODS = ['first', 'mean']
+
+# STAC Item properties (or coordinates along the time dimension) that identify the
+# acquisition a STAC Item or time step belongs to, e.g. the orbit or datatake
+ACQ_SLICE_KEYS = ['platform', 'sat:orbit_state', 'sat:relative_orbit',
+                  'sat:absolute_orbit', 's2:datatake_id']
+
+# Maximum time difference between consecutive slices of the same acquisition
+MAX_GAP = '1h'
+
+
+def group_acquisitions(times: ndarray,
+                       keys: Optional[list[tuple[Any, ...]]] = None,
+                       max_gap: str = MAX_GAP
+                       ) -> tuple[ndarray, ndarray]:
+    """
+    Assigns acquisition slices (e.g. STAC Items or time steps) to acquisitions. Slices
+    belong to the same acquisition if they have the same acquisition key (e.g. orbit
+    and platform) and are not further apart than `max_gap` from the previous slice of
+    the acquisition.
+    
+    Parameters
+    ----------
+    times : ndarray
+        The acquisition times of the slices as datetime64 values.
+    keys : list of tuple, optional
+        The acquisition key of each slice. Defaults to None, which groups the slices
+        by `max_gap` only.
+    max_gap : str, optional
+        Maximum time difference between consecutive slices of an acquisition. Defaults
+        to '1h'.
+    
+    Returns
+    -------
+    codes : ndarray
+        The index of the acquisition of each slice. Acquisitions are numbered in the
+        order of their earliest slice.
+    first : ndarray
+        The index of the earliest slice of each acquisition.
+    """
+    times = np.asarray(times, dtype='datetime64[ns]')
+    if keys is None or len(keys) == 0:
+        keys = [()] * len(times)
+    gap = pd.Timedelta(max_gap).to_timedelta64()
+    
+    codes = np.empty(len(times), dtype='int64')
+    first = []
+    latest = {}
+    for i in np.argsort(times, kind='stable'):
+        key = keys[i]
+        if key in latest and times[i] - times[latest[key][1]] <= gap:
+            codes[i] = latest[key][0]
+        else:
+            codes[i] = len(first)
+            first.append(i)
+        latest[key] = (codes[i], i)
+    return codes, np.asarray(first, dtype='int64')
+
+
+def group_items(items: list[Item],
+                groupby: Optional[str] = None,
+                lon: Optional[float] = None
+                ) -> tuple[ndarray, ndarray]:
+    """
+    Assigns STAC Items to the time steps they are loaded into.
+    
+    Parameters
+    ----------
+    items : list of Item
+        The STAC Items.
+    groupby : str, optional
+        The grouping mode (see `GROUPBY_MODES`):
+        - 'time' (default): STAC Items with the same datetime.
+        - 'solar_day': STAC Items acquired on the same day in local solar time.
+        - 'datatake': STAC Items of the same acquisition, i.e. with the same
+        acquisition metadata (see `ACQ_SLICE_KEYS`) and not further apart than
+        `MAX_GAP`.
+    lon : float, optional
+        Longitude of the area of interest, which is used to calculate the local solar
+        time. Defaults to None, which uses the center of each STAC Item.
+    
+    Returns
+    -------
+    codes : ndarray
+        The index of the time step of each STAC Item. Time steps are numbered in the
+        order of their earliest STAC Item.
+    times : ndarray
+        The time of each time step, i.e. the datetime of its earliest STAC Item.
+    """
+    if groupby is None:
+        groupby = 'time'
+    if groupby not in GROUPBY_MODES:
+        raise ValueError(f"Grouping mode '{groupby}' is not supported. Use one of "
+                         f"{GROUPBY_MODES}.")
+    times = np.array([query._to_datetime64(item.datetime) for item in items],
+                     dtype='datetime64[ns]')
+    
+    if groupby == 'datatake':
+        keys = [tuple(str(item.properties.get(k)) for k in ACQ_SLICE_KEYS)
+                for item in items]
+        codes, first = group_acquisitions(times, keys)
+        return codes, times[first]
+    
+    if groupby == 'time':
+        labels = times
+    else:
+        labels = np.array([_solar_date(t, item, lon) for t, item in zip(times, items)],
+                          dtype='datetime64[D]')
+    _, codes = np.unique(labels, return_inverse=True)
+    group_times = pd.Series(times).groupby(codes).min().to_numpy()
+    return codes.astype('int64'), group_times
+
+
+def odc_groupby(items: list[Item],
+                groupby: Optional[str] = None,
+                lon: Optional[float] = None,
+                fuse: str = 'first'
+                ) -> str | Callable[..., int]:
+    """
+    Creates the `groupby` parameter of `odc.stac.load` for a grouping mode (see
+    `group_items`), so that the time steps of the loaded data match `group_items`.
+    For the fuse method 'mean', each STAC Item is loaded as a separate time step
+    instead, so that the time steps can be averaged with `fuse_groups` afterwards.
+    
+    Parameters
+    ----------
+    items : list of Item
+        The STAC Items to be loaded, in the order they are passed to `odc.stac.load`.
+    groupby : str, optional
+        The grouping mode (see `GROUPBY_MODES`). Defaults to None, which groups by
+        time.
+    lon : float, optional
+        Longitude of the area of interest, which is used to calculate the local solar
+        time. Defaults to None.
+    fuse : str, optional
+        The fuse method (see `FUSE_METHODS`). Defaults to 'first'.
+    
+    Returns
+    -------
+    str or callable
+        The `groupby` parameter of `odc.stac.load`.
+    """
+    if fuse not in FUSE_METHODS:
+        raise ValueError(f"Fuse method '{fuse}' is not supported. Use one of "
+                         f"{FUSE_METHODS}.")
+    if fuse == 'mean':
+        return partial(_group_key, codes=np.arange(len(items)))
+    if groupby is None or groupby == 'time':
+        return 'time'
+    codes, _ = group_items(items, groupby=groupby, lon=lon)
+    return partial(_group_key, codes=codes)
+
+
+def fuse_groups(ds: Dataset,
+                codes: ndarray,
+                first: Optional[ndarray] = None,
+                method: str = 'mean',
+                categorical: Optional[list[str]] = None,
+                use_flox: bool = True
+                ) -> Dataset:
+    """
+    Fuses groups of time steps of a Dataset (e.g. the STAC Items of a time step or the
+    slices of an acquisition) into a single time step each. Each group is labeled with
+    its earliest time step, including all coordinates along the time dimension.
+    
+    Integer data variables with a `nodata` attribute are masked before fusing and are
+    returned with their original data type and nodata value.
+    
+    Parameters
+    ----------
+    ds : Dataset
+        The Dataset to be fused.
+    codes : ndarray
+        The index of the group of each time step. Groups are numbered consecutively
+        from 0 in the order of their earliest time step.
+    first : ndarray, optional
+        The index of the earliest time step of each group. Defaults to None, which
+        derives it from the time coordinate.
+    method : str, optional
+        How to fuse the time steps of a group. Either 'mean' (default), which
+        calculates the mean of all valid values, or 'mosaic', which takes the first
+        valid value in time order.
+    categorical : list of str, optional
+        Names of data variables that are always fused with 'mosaic'. Defaults to None.
+    use_flox : bool, optional
+        Whether to use the `flox` backend for the operation. Defaults to True.
+    
+    Returns
+    -------
+    Dataset
+        The fused Dataset.
+    """
+    if method not in ['mean', 'mosaic']:
+        raise ValueError(f"Method '{method}' is not supported. Use 'mean' or "
+                         f"'mosaic'.")
+    if first is None:
+        first = pd.Series(ds.time.values).groupby(codes).idxmin().to_numpy()
+    categorical = [v for v in categorical or [] if v in ds.data_vars]
+    meta = [c for c in ds.coords if c != 'time' and ds[c].dims == ('time',)]
+    
+    int_vars = masked_int_vars(ds)
+    ds_masked = ds.drop_vars(meta).assign(
+        {v: ds[v].where(ds[v] != ds[v].attrs['nodata']) for v in int_vars})
+    by = DataArray(codes, dims='time', name='group')
+    mosaic = categorical if method == 'mean' else list(ds.data_vars)
+    with xr.set_options(use_flox=use_flox):
+        parts = []
+        if len(mosaic) < len(ds.data_vars):
+            parts.append(ds_masked.drop_vars(mosaic).groupby(by)
+                         .mean(skipna=True, keep_attrs=True))
+        if mosaic:
+            parts.append(ds_masked[mosaic].groupby(by)
+                         .first(skipna=True, keep_attrs=True))
+    ds_out = xr.merge(parts, combine_attrs='override')[list(ds.data_vars)]
+    
+    ds_out = ds_out.rename({'group': 'time'}).assign_attrs(ds.attrs)
+    ds_out = ds_out.assign_coords(time=ds.time.values[first],
+                                  **{c: ('time', ds[c].values[first]) for c in meta})
+    for v in int_vars:
+        nodata = ds[v].attrs['nodata']
+        ds_out[v] = ds_out[v].round().fillna(nodata).astype(ds[v].dtype)
+    return ds_out
+
+
+def masked_int_vars(ds: Dataset) -> list[str]:
+    """Gets the names of all integer data variables with a `nodata` attribute."""
+    return [v for v in ds.data_vars if 'nodata' in ds[v].attrs and
+            np.issubdtype(ds[v].dtype, np.integer)]
+
+
+def _group_key(item: Item,
+               parsed: Any,
+               idx: int,
+               codes: ndarray
+               ) -> int:
+    """Group key of `odc.stac.load` that looks up the precomputed time step."""
+    return int(codes[idx])
+
+
+def _solar_date(time: np.datetime64,
+                item: Item,
+                lon: Optional[float] = None
+                ) -> np.datetime64:
+    """Calculates the date of an acquisition in local solar time."""
+    if lon is None:
+        lon = (item.bbox[0] + item.bbox[2]) / 2 if item.bbox is not None else 0.0
+    offset = np.timedelta64(int(round(lon / 15 * 3600)), 's')
+    return (time + offset).astype('datetime64[D]')
@@ -1,31 +1,44 @@
 import glob
 import re
 from datetime import datetime
+from weakref import WeakKeyDictionary
 import pytz
-from shapely.geometry import box
+import numpy as np
 
 from pathlib import Path
-from typing import Optional, Iterable
+from typing import Optional, Iterable, Iterator, Sequence
+from numpy import ndarray
 from pystac import Catalog, Collection, Item
+from shapely.geometry.base import BaseGeometry
+
+from sdc import _profiling
 
 
 def filter_stac_catalog(catalog: Catalog,
-                        bbox: Optional[tuple[float]] = None,
+                        bbox: Optional[tuple[float] | Sequence[tuple[float]]] = None,
                         collection_ids: Optional[list[str]] = None,
                         time_range: Optional[tuple[str, str]] = None,
-                        time_pattern: Optional[str] = None
+                        time_pattern: Optional[str] = None,
+                        use_index: bool = True,
+                        lazy: bool = False,
+                        geometry: Optional[BaseGeometry] = None
                         ) -> tuple[list[Collection], Iterable[Item]]:
     """
     The STAC Catalog is first filtered based on a provided bounding box, returning a
     list of STAC Collections. These Collections are then filtered based on a provided
     time range, returning a list of STAC Items.
     
+    If the STAC Catalog has been read from a file, the filtering is done with a
+    persistent item index of the STAC Catalog (see `sdc.products._index`) instead of
+    walking all STAC Collection and STAC Item files.
+    
     Parameters
     ----------
     catalog : Catalog
         The STAC Catalog to filter.
-    bbox : tuple of float, optional
-        The bounding box of the area of interest in the format (minx, miny, maxx, maxy).
+    bbox : tuple of float or sequence of tuple of float, optional
+        The bounding box of the area of interest in the format (minx, miny, maxx, maxy)
+        or a sequence of such bounding boxes.
     collection_ids : list of str, optional
         A list of collection IDs to filter. If not None, this will override the `bbox`
         option.
@@ -36,21 +49,71 @@ def filter_stac_catalog(catalog: Catalog,
     time_pattern : str, optional
         Time pattern to parse the time range. Only needed if it deviates from the
         default: '%Y-%m-%d'.
+    use_index : bool, optional
+        Whether to use the persistent item index of the STAC Catalog. Default is True.
+    lazy : bool, optional
+        Whether to return the filtered items as a generator instead of a list.
+        Default is False.
+    geometry : BaseGeometry, optional
+        A geometry of the area of interest in EPSG:4326 (e.g. the union of all
+        features of a vector file). If provided, only STAC Collections and STAC Items
+        that actually intersect the geometry are returned and not all of those
+        intersecting its bounding box. Default is None.
     
     Returns
     -------
     filtered_collections : list of Collection
         A list of filtered collections.
-    filtered_items : list of Item
-        A list of filtered items.
+    filtered_items : list of Item or Iterator of Item
+        A list (or generator) of filtered items.
     """
-    filtered_collections = filter_collections(catalog, bbox, collection_ids)
-    filtered_items = filter_items(filtered_collections, time_range, time_pattern)
+    with _profiling.stage('filter_items'):
+        filtered_collections, filtered_items = _filter_stac_catalog(
+            catalog=catalog, bbox=bbox, collection_ids=collection_ids,
+            time_range=time_range, time_pattern=time_pattern, use_index=use_index,
+            lazy=lazy, geometry=geometry)
+    if not lazy:
+        _profiling.count('n_items', len(filtered_items))
+        _profiling.count('n_assets', sum(len(item.assets) for item in filtered_items))
+    return filtered_collections, filtered_items
+
+
+def _filter_stac_catalog(catalog: Catalog,
+                         bbox: Optional[tuple[float] | Sequence[tuple[float]]] = None,
+                         collection_ids: Optional[list[str]] = None,
+                         time_range: Optional[tuple[str, str]] = None,
+                         time_pattern: Optional[str] = None,
+                         use_index: bool = True,
+                         lazy: bool = False,
+                         geometry: Optional[BaseGeometry] = None
+                         ) -> tuple[list[Collection], Iterable[Item]]:
+    """See `filter_stac_catalog`."""
+    if geometry is not None and bbox is None and collection_ids is None:
+        bbox = geometry.bounds
+    
+    catalog_path = catalog.get_self_href()
+    if use_index and catalog_path is not None and Path(catalog_path).exists():
+        from sdc.products._index import filter_index
+        filtered_collections, filtered_items = filter_index(
+            catalog_path=catalog_path, bbox=bbox, collection_ids=collection_ids,
+            time_range=time_range, time_pattern=time_pattern, lazy=lazy)
+    else:
+        filtered_collections = filter_collections(catalog, bbox, collection_ids)
+        filtered_items = filter_items(filtered_collections, time_range, time_pattern,
+                                      lazy=lazy)
+    
+    if geometry is not None:
+        filtered_collections = filter_by_geometry(filtered_collections, geometry,
+                                                  bboxes=True)
+        filtered_items = filter_by_geometry(filtered_items, geometry)
+        if not lazy:
+            filtered_items = list(filtered_items)
     return filtered_collections, filtered_items
 
 
 def filter_collections(catalog: Catalog,
-                       bbox: Optional[tuple[float, float, float, float]] = None,
+                       bbox: Optional[tuple[float, float, float, float] |
+                                      Sequence[tuple[float, float, float, float]]] = None,
                        collection_ids: Optional[list[str]] = None
                        ) -> list[Collection]:
     """
@@ -60,8 +123,10 @@ def filter_collections(catalog: Catalog,
     ----------
     catalog : Catalog
         The STAC Catalog to filter.
-    bbox : tuple of float, optional
+    bbox : tuple of float or sequence of tuple of float, optional
         The bounding box of the area of interest in the format (minx, miny, maxx, maxy).
+        A sequence of bounding boxes can be provided as well, in which case all
+        collections intersecting any of the bounding boxes are returned.
     collection_ids : list of str, optional
         A list of collection IDs to filter. If not None, this will override the `bbox`
         option.
@@ -71,53 +136,124 @@ def filter_collections(catalog: Catalog,
     list of Collection
         A list of filtered collections.
     """
+    collections = [collection for collection in catalog.get_children()
+                   if isinstance(collection, Collection)]
     if collection_ids is not None:
-        return [collection for collection in catalog.get_children()
-                if isinstance(collection, Collection) and
-                collection.id in collection_ids]
+        return [collection for collection in collections
+                if collection.id in collection_ids]
     elif bbox is not None:
-        return [collection for collection in catalog.get_children() if
-                isinstance(collection, Collection) and
-                collection.extent.spatial.bboxes is not None and
-                any(_bbox_intersection(list(bbox), b) is not None
-                    for b in collection.extent.spatial.bboxes)]
+        extents, owner = collection_extents(collections)
+        hits = intersecting_bboxes(bbox, extents).any(axis=0)
+        return [collections[i] for i in np.unique(owner[hits])]
     else:
-        return [collection for collection in catalog.get_children()
-                if isinstance(collection, Collection)]
+        return collections
 
 
-def _bbox_intersection(bbox1: list[float, float, float, float],
-                       bbox2: list[float, float, float, float]
-                       ) -> list[float, float, float, float] | None:
+def filter_by_geometry(objs: Iterable[Collection | Item],
+                       geometry: BaseGeometry,
+                       bboxes: bool = False
+                       ) -> list[Collection] | Iterator[Item]:
     """
-    Computes the intersection of two bounding boxes.
+    Filters STAC Collections or STAC Items based on their intersection with a geometry.
     
     Parameters
     ----------
-    bbox1 : list of float
-        The first bounding box in the format [west, south, east, north].
-    bbox2 : list of float
-        The second bounding box in the format [west, south, east, north].
+    objs : iterable of Collection or Item
+        The STAC Collections or STAC Items to filter.
+    geometry : BaseGeometry
+        The geometry of the area of interest in EPSG:4326.
+    bboxes : bool, optional
+        Whether the objects are STAC Collections, which are tested against the
+        bounding boxes of their spatial extent. Otherwise, STAC Items are tested
+        against their footprint (or their bounding box if they have no geometry).
+        Default is False.
     
     Returns
     -------
-    intersection : list of float or None
-        The intersection of the two bounding boxes as a list of float.
-        Returns None if there is no intersection.
-    """
-    box1 = box(*bbox1)
-    box2 = box(*bbox2)
-    intersection = box1.intersection(box2)
-    if intersection.is_empty:
-        return None
-    else:
-        return list(intersection.bounds)
+    list of Collection or Iterator of Item
+        The STAC Collections (as a list) or STAC Items (as a generator) intersecting
+        the geometry.
+    """
+    import shapely
+    from shapely.geometry import box, shape
+    
+    shapely.prepare(geometry)
+    if bboxes:
+        objs = list(objs)
+        extents, owner = collection_extents(objs)
+        hits = shapely.intersects(geometry, shapely.box(*extents.T))
+        return [objs[i] for i in np.unique(owner[hits])]
+    return (item for item in objs
+            if (item.geometry is None and item.bbox is None) or
+            geometry.intersects(shape(item.geometry) if item.geometry is not None
+                                else box(*item.bbox[:2], *item.bbox[-2:])))
+
+
+def collection_extents(collections: list[Collection]
+                       ) -> tuple[ndarray, ndarray]:
+    """
+    Collects the spatial extents of a list of STAC Collections into a single array, so
+    that they can be compared with bounding boxes in a vectorized manner.
+    
+    Parameters
+    ----------
+    collections : list of Collection
+        The list of collections.
+    
+    Returns
+    -------
+    extents : ndarray
+        An array of shape (n, 4) containing all bounding boxes of the collections in
+        the format (minx, miny, maxx, maxy).
+    owner : ndarray
+        An array of shape (n,) containing the index of the collection in
+        `collections` that each bounding box belongs to.
+    """
+    extents = []
+    owner = []
+    for i, collection in enumerate(collections):
+        for b in collection.extent.spatial.bboxes or []:
+            extents.append([*b[:2], *b[-2:]])
+            owner.append(i)
+    return (np.asarray(extents, dtype='float64').reshape(-1, 4),
+            np.asarray(owner, dtype='int64'))
+
+
+def intersecting_bboxes(bboxes1: tuple[float, float, float, float] |
+                                 Sequence[tuple[float, float, float, float]] | ndarray,
+                        bboxes2: tuple[float, float, float, float] |
+                                 Sequence[tuple[float, float, float, float]] | ndarray
+                        ) -> ndarray:
+    """
+    Tests all pairs of two sets of bounding boxes for intersection. Bounding boxes that
+    only touch each other are considered to be intersecting.
+    
+    Parameters
+    ----------
+    bboxes1 : tuple of float or sequence of tuple of float or ndarray
+        A single bounding box or a sequence of n bounding boxes in the format
+        (minx, miny, maxx, maxy).
+    bboxes2 : tuple of float or sequence of tuple of float or ndarray
+        A single bounding box or a sequence of m bounding boxes in the format
+        (minx, miny, maxx, maxy).
+    
+    Returns
+    -------
+    ndarray
+        A boolean array of shape (n, m), which is True where the bounding boxes of
+        `bboxes1` and `bboxes2` intersect.
+    """
+    b1 = np.asarray(bboxes1, dtype='float64').reshape(-1, 4)[:, np.newaxis, :]
+    b2 = np.asarray(bboxes2, dtype='float64').reshape(-1, 4)[np.newaxis, :, :]
+    return ((b1[..., 0] <= b2[..., 2]) & (b1[..., 2] >= b2[..., 0]) &
+            (b1[..., 1] <= b2[..., 3]) & (b1[..., 3] >= b2[..., 1]))
 
 
 def filter_items(collections: list[Collection],
                  time_range: Optional[tuple[str, str]] = None,
-                 time_pattern: Optional[str] = None
-                 ) -> list[Item]:
+                 time_pattern: Optional[str] = None,
+                 lazy: bool = False
+                 ) -> list[Item] | Iterator[Item]:
     """
     Filters the items in a list of collections based on a time range.
     
@@ -132,24 +268,72 @@ def filter_items(collections: list[Collection],
     time_pattern : str, optional
         Time pattern to parse the time range. Only needed if it deviates from the
         default: '%Y-%m-%d'.
+    lazy : bool, optional
+        Whether to return a generator that yields the filtered items one collection at
+        a time instead of a list. Default is False.
     
     Returns
     -------
-    items : list of Item
-        A list of filtered items.
+    items : list of Item or Iterator of Item
+        A list (or generator) of filtered items.
+    """
+    start_date = end_date = None
+    if time_range is not None:
+        start_date = _timestring_to_utc_datetime(time=time_range[0],
+                                                 pattern=time_pattern)
+        end_date = _timestring_to_utc_datetime(time=time_range[1],
+                                               pattern=time_pattern)
+    items = _iter_items(collections, start_date, end_date)
+    return items if lazy else list(items)
+
+
+def _iter_items(collections: list[Collection],
+                start_date: Optional[datetime] = None,
+                end_date: Optional[datetime] = None
+                ) -> Iterator[Item]:
+    """
+    Yields the items of a list of collections that lie within the (inclusive) time
+    range defined by `start_date` and `end_date`. The items of each collection are
+    selected with a binary search on its sorted item datetimes.
     """
-    items = []
     for collection in collections:
-        for item in collection.get_items():
-            if time_range is not None:
-                start_date = _timestring_to_utc_datetime(time=time_range[0],
-                                                         pattern=time_pattern)
-                end_date = _timestring_to_utc_datetime(time=time_range[1],
-                                                       pattern=time_pattern)
-                if not (start_date <= item.datetime <= end_date):
-                    continue
-            items.append(item)
-    return items
+        items = list(collection.get_items())
+        if start_date is None:
+            yield from items
+            continue
+        times, order = _sorted_item_datetimes(collection, items)
+        lower = np.searchsorted(times, _to_datetime64(start_date), side='left')
+        upper = np.searchsorted(times, _to_datetime64(end_date), side='right')
+        for i in np.sort(order[lower:upper]):
+            yield items[i]
+
+
+_ITEM_DATETIMES = WeakKeyDictionary()
+
+
+def _sorted_item_datetimes(collection: Collection,
+                           items: list[Item]
+                           ) -> tuple[ndarray, ndarray]:
+    """
+    Gets the sorted datetimes of the items of a collection and the permutation that
+    sorts them. The result is cached for as long as the collection object is alive.
+    """
+    if collection not in _ITEM_DATETIMES:
+        times = np.array([_to_datetime64(item.datetime or
+                                         item.common_metadata.start_datetime)
+                          for item in items], dtype='datetime64[us]')
+        order = np.argsort(times, kind='stable')
+        _ITEM_DATETIMES[collection] = (times[order], order)
+    return _ITEM_DATETIMES[collection]
+
+
+def _to_datetime64(dt: Optional[datetime]) -> np.datetime64:
+    """Converts a datetime object to a timezone-naive UTC datetime64 object."""
+    if dt is None:
+        return np.datetime64('NaT', 'us')
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(pytz.UTC).replace(tzinfo=None)
+    return np.datetime64(dt, 'us')
 
 
 def filter_mswep_nc(directory: Path,
@@ -176,20 +360,27 @@ def filter_mswep_nc(directory: Path,
     files : list of str
         A list of paths to MSWEP NetCDF files.
     """
-    files = glob.glob(str(directory.joinpath('*.nc')))
+    files = sorted(glob.glob(str(directory.joinpath('*.nc'))))
     if time_range is not None:
         start_time = _timestring_to_utc_datetime(time_range[0], time_pattern)
         end_time = _timestring_to_utc_datetime(time_range[1], time_pattern)
-        years = [start_time.year + i for i in range(end_time.year -
-                                                    start_time.year + 1)]
-        files = [f for f in files if any(str(y) in f for y in years)]
+        files_flt = []
+        for file in files:
+            # Each file contains the data of a single year
+            match = re.findall(r'(?<!\d)(\d{4})(?!\d)', Path(file).name)
+            if not match:
+                continue
+            year = int(match[-1])
+            if start_time.year <= year <= end_time.year:
+                files_flt.append(file)
+        files = files_flt
     return files
 
 
 def filter_chirps(directory: Path,
                   time_range: Optional[tuple[str, str]] = None,
                   time_pattern: Optional[str] = None
-                  ) -> list[str]:
+                  ) -> list[tuple[str, datetime]]:
     """
     Find and filter CHIRPS GeoTIFF files based on a time range.
     
@@ -207,24 +398,25 @@ def filter_chirps(directory: Path,
     
     Returns
     -------
-    files : list of str
-        A list of paths to CHIRPS GeoTIFF files.
+    files : list of tuple of str and datetime
+        A list of paths to CHIRPS GeoTIFF files together with the (UTC) start of the
+        month they contain, sorted by time.
     """
     files = glob.glob(str(directory.joinpath('*.tif')))
+    start_time = end_time = None
     if time_range is not None:
         start_time = _timestring_to_utc_datetime(time_range[0], time_pattern)
         end_time = _timestring_to_utc_datetime(time_range[1], time_pattern)
-        files_flt = []
-        for file in files:
-            match = re.search(r'chirps-v3\.0\.(\d{4})\.(\d{1,2})\.tif', file)
-            if not match:
-                continue
-            year, month = map(int, match.groups())
-            file_time = datetime(year, month, 1, tzinfo=pytz.UTC)
-            if start_time <= file_time < end_time:
-                files_flt.append(file)
-        files = files_flt
-    return files
+    files_flt = []
+    for file in files:
+        match = re.search(r'chirps-v3\.0\.(\d{4})\.(\d{1,2})\.tif', file)
+        if not match:
+            continue
+        year, month = map(int, match.groups())
+        file_time = datetime(year, month, 1, tzinfo=pytz.UTC)
+        if time_range is None or start_time <= file_time < end_time:
+            files_flt.append((file, file_time))
+    return sorted(files_flt, key=lambda x: x[1])
 
 
 def _timestring_to_utc_datetime(time: str,
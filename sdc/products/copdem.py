@@ -1,12 +1,10 @@
 import numpy as np
-from pystac import Catalog
+import dask.array as dsk
 from odc.stac import load as odc_stac_load
-import rioxarray
-from rasterio.enums import Resampling
-from xrspatial import slope, aspect
 
 from typing import Optional
 from xarray import DataArray
+from numpy import ndarray
 
 from sdc.products import _ancillary as anc
 from sdc.products import _query as query
@@ -43,7 +41,7 @@ def load_copdem(bounds: tuple[float],
     product = 'cop_dem'
     bands = ['elevation']
     
-    catalog = Catalog.from_file(anc.get_catalog_path(product=product))
+    catalog = anc.get_catalog(product=product)
     _, items = query.filter_stac_catalog(catalog=catalog, bbox=bounds)
     
     params = anc.common_params()
@@ -66,23 +64,89 @@ def load_copdem(bounds: tuple[float],
 
 def _calc_slope_aspect(da: DataArray
                        ) -> tuple[DataArray, DataArray]:
-    """Calculate slope and aspect from a Copernicus DEM DataArray."""
-    
-    # Reproject DataArray to UTM
-    utm_epsg = f'EPSG:{da.rio.estimate_utm_crs().to_epsg()}'
-    da_utm = da.rio.reproject(dst_crs=utm_epsg, 
-                              resampling=Resampling.bilinear)
+    """
+    Calculate slope and aspect (both in degrees) from a Copernicus DEM DataArray.
     
-    # Calculate slope and aspect
-    da_slope_utm = slope(da_utm)
-    da_aspect_utm = aspect(da_utm)
+    The gradients are calculated chunk-wise with Horn's method directly on the grid of
+    the DataArray, using a halo of one pixel around each chunk. For geographic
+    coordinate reference systems, the metric pixel spacing is calculated per row from
+    the WGS84 ellipsoid, so that no reprojection is needed. Border pixels of the
+    DataArray are set to NaN.
+    """
+    cellsize_x, cellsize_y = _metric_cellsizes(da)
+    data = dsk.asarray(da.data).astype('float32')
+    row_chunks = (data.chunks[0], 1)
+    cellsize_x = dsk.from_array(cellsize_x, chunks=row_chunks)
+    cellsize_y = dsk.from_array(cellsize_y, chunks=row_chunks)
     
-    # Reproject slope and aspect back to original CRS
-    da_slope = da_slope_utm.rio.reproject_match(match_data_array=da, 
-                                                resampling=Resampling.bilinear)
-    da_aspect = da_aspect_utm.rio.reproject_match(match_data_array=da,
-                                                  resampling=Resampling.bilinear)
-    da_slope = da_slope.rename({'x': 'longitude', 'y': 'latitude'})
-    da_aspect = da_aspect.rename({'x': 'longitude', 'y': 'latitude'})
+    kwargs = {'depth': [{0: 1, 1: 1}, {0: 1, 1: 0}],
+              'boundary': np.nan,
+              'dtype': 'float32'}
+    dz_dx = dsk.map_overlap(_horn_gradient, data, cellsize_x, axis=1, **kwargs)
+    dz_dy = dsk.map_overlap(_horn_gradient, data, cellsize_y, axis=0, **kwargs)
     
+    da_slope = da.copy(data=dsk.map_blocks(_slope, dz_dx, dz_dy, dtype='float32'))
+    da_aspect = da.copy(data=dsk.map_blocks(_aspect, dz_dx, dz_dy, dtype='float32'))
     return da_slope, da_aspect
+
+
+def _metric_cellsizes(da: DataArray
+                      ) -> tuple[ndarray, ndarray]:
+    """
+    Get the pixel spacing in meters in x and y direction for each row of a DataArray
+    as arrays of shape (rows, 1).
+    """
+    geobox = da.odc.geobox
+    res_x, res_y = abs(geobox.resolution.x), abs(geobox.resolution.y)
+    rows = geobox.shape.y
+    if not geobox.crs.geographic:
+        return np.full((rows, 1), res_x), np.full((rows, 1), res_y)
+    
+    # Radii of curvature of the WGS84 ellipsoid (prime vertical and meridian)
+    a, e2 = 6378137.0, 6.69437999014e-3
+    lat = np.deg2rad(geobox.coords[geobox.dimensions[0]].values).reshape(rows, 1)
+    w = np.sqrt(1 - e2 * np.sin(lat) ** 2)
+    n = a / w
+    m = a * (1 - e2) / w ** 3
+    return n * np.cos(lat) * np.deg2rad(res_x), m * np.deg2rad(res_y)
+
+
+def _horn_gradient(z: ndarray,
+                   cellsize: ndarray,
+                   axis: int
+                   ) -> ndarray:
+    """
+    Calculate the gradient of a block along the rows (axis=0, positive towards the
+    last row) or the columns (axis=1, positive towards the last column) with Horn's
+    method. The border of the block is set to NaN.
+    """
+    if axis == 0:
+        diff = z[2:, :] - z[:-2, :]
+        weighted = diff[:, :-2] + 2 * diff[:, 1:-1] + diff[:, 2:]
+    else:
+        diff = z[:, 2:] - z[:, :-2]
+        weighted = diff[:-2, :] + 2 * diff[1:-1, :] + diff[2:, :]
+    out = np.full(z.shape, np.nan, dtype='float32')
+    out[1:-1, 1:-1] = weighted / (8 * cellsize[1:-1])
+    return out
+
+
+def _slope(dz_dx: ndarray,
+           dz_dy: ndarray
+           ) -> ndarray:
+    """Calculate the slope in degrees from the gradients of a block."""
+    return np.degrees(np.arctan(np.hypot(dz_dx, dz_dy))).astype('float32')
+
+
+def _aspect(dz_dx: ndarray,
+            dz_dy: ndarray
+            ) -> ndarray:
+    """
+    Calculate the aspect as compass direction in degrees from the gradients of a block.
+    Flat pixels are set to -1 (same convention as `xrspatial.aspect`).
+    """
+    aspect = np.degrees(np.arctan2(dz_dy, -dz_dx))
+    aspect = np.where(aspect < 0, 90 - aspect,
+                      np.where(aspect > 90, 450 - aspect, 90 - aspect))
+    aspect = np.where((dz_dx == 0) & (dz_dy == 0), -1, aspect)
+    return aspect.astype('float32')
@@ -1,11 +1,13 @@
-from pathlib import Path
+from datetime import datetime
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 import xarray as xr
 import pandas as pd
 from odc.geo.xr import assign_crs
 from rioxarray import open_rasterio
 
 from typing import Optional
-from xarray import DataArray
+from xarray import Dataset, DataArray
 
 from sdc.products import _ancillary as anc
 from sdc.products import _query as query
@@ -45,22 +47,35 @@ def load_mswep(bounds: tuple[float, float, float, float],
     nc_files = query.filter_mswep_nc(directory=anc.get_catalog_path(product='mswep'),
                                      time_range=time_range,
                                      time_pattern=time_pattern)
-    ds_list = []
-    for nc in nc_files:
-        _ds = xr.open_dataset(nc)
-        ds_list.append(_ds)
+    
+    # Open files in parallel and subset each of them lazily before concatenation, so
+    # that only the area and time range of interest will be read from disk
+    open_nc = partial(_open_mswep_nc, bounds=bounds, time_range=time_range)
+    with ThreadPoolExecutor() as pool:
+        ds_list = [ds for ds in pool.map(open_nc, nc_files) if ds.sizes['time'] > 0]
     
     ds = xr.concat(ds_list, dim="time")
     ds = ds.rename({'lon': 'longitude', 'lat': 'latitude'})
     ds = assign_crs(ds, crs=4326)
-    del ds.attrs['history']
+    ds.attrs.pop('history', None)
     
-    ds = ds.sel(longitude=slice(bounds[0], bounds[2]),
-                latitude=slice(bounds[3], bounds[1]))
+    return ds.precipitation
+
+
+def _open_mswep_nc(nc: str,
+                   bounds: tuple[float, float, float, float],
+                   time_range: Optional[tuple[str, str]] = None
+                   ) -> Dataset:
+    """
+    Opens a single MSWEP NetCDF file, subsets it to the area and time range of
+    interest and wraps the (still unloaded) result in a single Dask chunk.
+    """
+    ds = xr.open_dataset(nc)
+    ds = ds.sel(lon=slice(bounds[0], bounds[2]),
+                lat=slice(bounds[3], bounds[1]))
     if time_range is not None:
         ds = ds.sel(time=slice(time_range[0], time_range[1]))
-    
-    return ds.precipitation
+    return ds.chunk(-1)
 
 
 def load_chirps(bounds: tuple[float, float, float, float],
@@ -70,21 +85,32 @@ def load_chirps(bounds: tuple[float, float, float, float],
     files = query.filter_chirps(directory=anc.get_catalog_path(product='chirps'),
                                 time_range=time_range,
                                 time_pattern=time_pattern)
-    files = [Path(f) for f in files]
     
-    da_list = []
-    for file_path in files:
-        da = open_rasterio(file_path)
-        year, month = file_path.stem.split("chirps-v3.0.")[1].split(".")
-        date_str = f"{year}-{month}-01"
-        da = da.assign_coords(time=pd.to_datetime(date_str))
-        da_list.append(da)
-
-    da_list = sorted(da_list, key=lambda x: x.time.values)
-    da = xr.concat(da_list, dim='time').squeeze()
-    da = da.where(da !=-9999.)
+    # Open files in parallel and subset each of them lazily before concatenation, so
+    # that only a window covering the area of interest will be read from disk
+    open_tif = partial(_open_chirps_tif, bounds=bounds)
+    with ThreadPoolExecutor() as pool:
+        da_list = list(pool.map(open_tif,
+                                [file for file, _ in files],
+                                [time for _, time in files]))
+    
+    da = xr.concat(da_list, dim='time')
+    da = da.where(da != -9999.)
     da = da.rename({'x': 'longitude', 'y': 'latitude'})
     da = assign_crs(da, crs=4326)
-    da = da.sel(longitude=slice(bounds[0], bounds[2]),
-                latitude=slice(bounds[3], bounds[1]))
     return da
+
+
+def _open_chirps_tif(file: str,
+                     time: datetime,
+                     bounds: tuple[float, float, float, float]
+                     ) -> DataArray:
+    """
+    Opens a single CHIRPS GeoTIFF file, subsets it to the area of interest and wraps
+    the (still unloaded) result in a single Dask chunk.
+    """
+    da = open_rasterio(file).squeeze('band', drop=True)
+    da = da.sel(x=slice(bounds[0], bounds[2]),
+                y=slice(bounds[3], bounds[1]))
+    da = da.assign_coords(time=pd.Timestamp(time).tz_localize(None))
+    return da.chunk(-1)
@@ -3,7 +3,7 @@ import planetary_computer
 from odc.stac import configure_rio, stac_load
 import numpy as np
 
-from sdc import dask_client
+from sdc import get_client
 from sdc.products import _ancillary as anc
 
 from typing import Optional
@@ -76,7 +76,7 @@ def load_from_stac(stac_endpoint: str,
             cloud_defaults=True,
             aws={"aws_unsigned": True},
             AWS_S3_ENDPOINT="s3.af-south-1.amazonaws.com",
-            client=dask_client
+            client=get_client()
         )
         stac_endpoint = "https://explorer.digitalearth.africa/stac"
     elif stac_endpoint == 'pc':
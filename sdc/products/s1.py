@@ -1,13 +1,15 @@
-from pystac import Catalog
+from pathlib import Path
 from odc.stac import load as odc_stac_load
 import xarray as xr
 import numpy as np
 
-from typing import Optional, Any, Iterable
+from typing import Optional
+from shapely.geometry.base import BaseGeometry
 from xarray import Dataset, DataArray
-from pystac import Item
 
+from sdc import _profiling
 from sdc.products import _ancillary as anc
+from sdc.products import _mosaic as mosaic
 from sdc.products import _query as query
 
 
@@ -15,7 +17,10 @@ def load_s1_rtc(bounds: tuple[float, float, float, float],
                 time_range: Optional[tuple[str, str]] = None,
                 time_pattern: Optional[str] = None,
                 override_defaults: Optional[dict] = None,
-                bands: Optional[list[str]] = None
+                bands: Optional[list[str]] = None,
+                geometry: Optional[BaseGeometry] = None,
+                groupby: Optional[str] = None,
+                fuse: str = 'first'
                 ) -> Dataset:
     """
     Loads the Sentinel-1 RTC data product for an area of interest.
@@ -45,6 +50,25 @@ def load_s1_rtc(bounds: tuple[float, float, float, float],
         - chunks: {'time': -1, 'latitude': 'auto', 'longitude': 'auto'}
     bands : list of str, optional
         A list of band names to load. Defaults to None, which will load all bands.
+    geometry : BaseGeometry, optional
+        A geometry of the area of interest in EPSG:4326. If provided, only STAC Items
+        intersecting the geometry (and not only its bounding box) are loaded. Defaults
+        to None.
+    groupby : str, optional
+        How to group the STAC Items into time steps while loading. Overlapping pixels of
+        the STAC Items of a time step are fused according to `fuse`. Options are:
+        - None (default) or 'time': STAC Items with the same datetime.
+        - 'solar_day': STAC Items acquired on the same day in local solar time.
+        - 'datatake': STAC Items of the same acquisition, i.e. with the same
+        acquisition metadata (e.g. platform and orbit) and less than one hour apart.
+        Each time step is labeled with the datetime of its earliest STAC Item.
+    fuse : str, optional
+        How to fuse overlapping pixels of the STAC Items of a time step. Either 'first'
+        (default), which takes the first valid pixel in time order, or 'mean', which
+        averages the valid pixels of all STAC Items of a time step. The `angle` band is
+        always fused with 'first'. For 'mean', each STAC Item is loaded as a separate
+        time step before the time steps are averaged, which needs more memory and
+        Dask tasks than 'first'.
     
     Returns
     -------
@@ -61,37 +85,46 @@ def load_s1_rtc(bounds: tuple[float, float, float, float],
     if bands is None:
         bands = ['vv', 'vh', 'area', 'angle']
     
-    catalog = Catalog.from_file(anc.get_catalog_path(product=product))
+    catalog = anc.get_catalog(product=product)
     _, items = query.filter_stac_catalog(catalog=catalog, bbox=bounds,
                                          time_range=time_range,
-                                         time_pattern=time_pattern)
+                                         time_pattern=time_pattern,
+                                         geometry=geometry)
     
     params = anc.common_params()
     if override_defaults is not None:
         params = anc.override_common_params(params=params, **override_defaults)
     
-    ds = odc_stac_load(items=items, bands=bands, bbox=bounds, 
-                       nodata=np.nan, dtype='float32', **params)
+    # Load all bands in a single pass, `angle` as uint8 with nearest neighbour
+    # resampling and all other bands as float32
+    band_cfg = {band: {'dtype': 'float32', 'nodata': np.nan} for band in bands}
     if 'angle' in bands:
-        ds['angle'] = _angle(items=items, bounds=bounds, params=params)
+        band_cfg['angle'] = {'dtype': 'uint8', 'nodata': 255, 'resampling': 'nearest'}
+    params = anc.band_params(params=params, band_cfg=band_cfg)
+    
+    # Group the slices of an acquisition into a single time step while loading, so
+    # that they are fused before they are returned. For 'mean', each STAC Item is
+    # loaded as a separate time step and the time steps are averaged afterwards
+    lon = (bounds[0] + bounds[2]) / 2
+    params['groupby'] = mosaic.odc_groupby(items, groupby=groupby, lon=lon, fuse=fuse)
+    
+    ds = odc_stac_load(items=items, bands=bands, bbox=bounds, **params)
+    
+    # Keep the orbit of each time step, e.g. to group acquisition slices or to separate
+    # ascending and descending orbits
+    ds = anc.assign_item_properties(ds, items=items,
+                                    properties=anc.S1_ITEM_PROPERTIES)
+    if fuse == 'mean':
+        codes, _ = mosaic.group_items(items, groupby=groupby, lon=lon)
+        ds = mosaic.fuse_groups(ds, codes=codes, categorical=['angle'])
     return ds
 
 
-def _angle(items: Iterable[Item],
-           bounds: tuple[float, float, float, float],
-           params: dict[str, Any]
-           ) -> DataArray:
-    """Loads the angle band from Sentinel-1 RTC product"""
-    params['resampling'] = 'nearest'
-    ds = odc_stac_load(items=items, bands='angle', bbox=bounds, 
-                       nodata=255, dtype='uint8', **params)
-    return ds.angle
-
-
 def load_s1_surfmi(bounds: tuple[float, float, float, float],
                    time_range: Optional[tuple[str, str]] = None,
                    time_pattern: Optional[str] = None,
-                   override_defaults: Optional[dict] = None
+                   override_defaults: Optional[dict] = None,
+                   geometry: Optional[BaseGeometry] = None
                    ) -> DataArray:
     """
     Loads the Sentinel-1 Surface Moisture Index (SurfMI) product for an area of interest.
@@ -119,6 +152,10 @@ def load_s1_surfmi(bounds: tuple[float, float, float, float],
         - resolution: 0.0002
         - resampling: 'bilinear'
         - chunks: {'time': -1, 'latitude': 'auto', 'longitude': 'auto'}
+    geometry : BaseGeometry, optional
+        A geometry of the area of interest in EPSG:4326. If provided, only STAC Items
+        intersecting the geometry (and not only its bounding box) are loaded. Defaults
+        to None.
     
     Returns
     -------
@@ -133,37 +170,34 @@ def load_s1_surfmi(bounds: tuple[float, float, float, float],
     if override_defaults is not None:
         params = anc.override_common_params(params=params, **override_defaults)
     chunks = params.pop('chunks')
-    rechunk = chunks.copy()
-    
-    # make sure we use default chunks with time=1
-    chunks = anc.common_params()['chunks']
-    chunks['time'] = 1
     
-    # Load dry and wet reference as well as s1_rtc data chunked per time step
-    catalog = Catalog.from_file(anc.get_catalog_path(product='s1_smi_2'))
+    # Load dry and wet reference as well as s1_rtc data with the same spatial chunks,
+    # so that the SurfMI can be calculated blockwise without rechunking
+    catalog = anc.get_catalog(product='s1_smi_2')
     _, items = query.filter_stac_catalog(catalog=catalog, bbox=bounds)
     ds_ref = odc_stac_load(items=items, bbox=bounds, 
                            nodata=np.nan, dtype='float32',
                            chunks=chunks, **params)
-    meta_dry = items[0].assets['vv_q05'].href.removeprefix('./')
-    meta_wet = items[0].assets['vv_q95'].href.removeprefix('./')
+    meta_dry = Path(items[0].assets['vv_q05'].href).name
+    meta_wet = Path(items[0].assets['vv_q95'].href).name
     
-    catalog = Catalog.from_file(anc.get_catalog_path(product='s1_rtc'))
+    catalog = anc.get_catalog(product='s1_rtc')
     _, items = query.filter_stac_catalog(catalog=catalog, bbox=bounds,
                                          time_range=time_range,
-                                         time_pattern=time_pattern)
+                                         time_pattern=time_pattern,
+                                         geometry=geometry)
     ds_s1 = odc_stac_load(items=items, bands=['vv'], bbox=bounds, 
                           nodata=np.nan, dtype='float32',
                           chunks=chunks, **params)
     
     # Squeeze time dimension from reference data and persist in cluster memory
     ds_ref = ds_ref.squeeze()
-    dry_ref = ds_ref.vv_q05.persist()
-    wet_ref = ds_ref.vv_q95.persist()
+    with _profiling.stage('persist_reference'):
+        dry_ref = ds_ref.vv_q05.persist()
+        wet_ref = ds_ref.vv_q95.persist()
     
-    # Calculate SurfMI and rechunk to wanted chunk size
+    # Calculate SurfMI
     smi = ((ds_s1.vv - dry_ref)/(wet_ref - dry_ref))*100
-    smi = smi.chunk(rechunk)
     smi = xr.where(smi < 0, 0, smi)
     smi = xr.where(smi > 100, 100, smi)
     
@@ -174,7 +208,8 @@ def load_s1_surfmi(bounds: tuple[float, float, float, float],
 def load_s1_coherence(bounds: tuple[float, float, float, float],
                       time_range: Optional[tuple[str, str]] = None,
                       time_pattern: Optional[str] = None,
-                      override_defaults: Optional[dict] = None
+                      override_defaults: Optional[dict] = None,
+                      geometry: Optional[BaseGeometry] = None
                       ) -> DataArray:
     """
     Loads the Sentinel-1 Coherence data product for an area of interest.
@@ -202,6 +237,10 @@ def load_s1_coherence(bounds: tuple[float, float, float, float],
         - resolution: 0.0002
         - resampling: 'bilinear'
         - chunks: {'time': -1, 'latitude': 'auto', 'longitude': 'auto'}
+    geometry : BaseGeometry, optional
+        A geometry of the area of interest in EPSG:4326. If provided, only STAC Items
+        intersecting the geometry (and not only its bounding box) are loaded. Defaults
+        to None.
     
     Returns
     -------
@@ -221,10 +260,11 @@ def load_s1_coherence(bounds: tuple[float, float, float, float],
     if override_defaults is not None:
         params = anc.override_common_params(params=params, **override_defaults)
     
-    catalog = Catalog.from_file(anc.get_catalog_path(product=product))
+    catalog = anc.get_catalog(product=product)
     _, items = query.filter_stac_catalog(catalog=catalog, bbox=bounds,
                                          time_range=time_range,
-                                         time_pattern=time_pattern)
+                                         time_pattern=time_pattern,
+                                         geometry=geometry)
     
     ds = odc_stac_load(items=items, bands=bands, bbox=bounds, 
                        nodata=np.nan, dtype='float32', **params)
@@ -1,14 +1,16 @@
 import numpy as np
 import xarray as xr
-from pystac import Catalog
 from odc.stac import load as odc_stac_load
 
-from typing import Optional, Any, Iterable
-from xarray import Dataset, DataArray
-from pystac import Item
+from typing import Optional
+from shapely.geometry.base import BaseGeometry
+from xarray import Dataset
+from numpy import ndarray
 
+from sdc import _profiling
 from sdc.utils import groupby_acq_slices
 from sdc.products import _ancillary as anc
+from sdc.products import _mosaic as mosaic
 from sdc.products import _query as query
 
 
@@ -19,7 +21,11 @@ def load_s2_l2a(bounds: tuple[float, float, float, float] = None,
                 apply_mask: bool = True,
                 group_acq_slices: bool = False,
                 override_defaults: Optional[dict] = None,
-                bands: Optional[list[str]] = None
+                bands: Optional[list[str]] = None,
+                as_uint16: bool = False,
+                geometry: Optional[BaseGeometry] = None,
+                groupby: Optional[str] = None,
+                fuse: str = 'first'
                 ) -> Dataset:
     """
     Loads the Sentinel-2 L2A data product for an area of interest.
@@ -58,6 +64,34 @@ def load_s2_l2a(bounds: tuple[float, float, float, float] = None,
         - chunks: {'time': -1, 'latitude': 'auto', 'longitude': 'auto'}
     bands : list of str, optional
         A list of band names to load. Defaults to None, which will load all bands.
+    as_uint16 : bool, optional
+        Whether to keep the data as scaled integers (uint16) with 0 as nodata value
+        instead of converting it to float32 reflectance values in range [0, 1], which
+        halves the memory footprint. The scaling is exposed via the `scale_factor` and
+        `add_offset` attributes of each band (see `sdc.utils.apply_scale_factor`).
+        Defaults to False.
+    geometry : BaseGeometry, optional
+        A geometry of the area of interest in EPSG:4326. If provided, only STAC Items
+        intersecting the geometry (and not only its bounding box) are loaded. Defaults
+        to None.
+    groupby : str, optional
+        How to group the STAC Items into time steps while loading. Overlapping pixels of
+        the STAC Items of a time step are fused according to `fuse`. Options are:
+        - None (default) or 'time': STAC Items with the same datetime.
+        - 'solar_day': STAC Items acquired on the same day in local solar time.
+        - 'datatake': STAC Items of the same acquisition, i.e. with the same
+        acquisition metadata (e.g. platform and orbit) and less than one hour apart.
+        Each time step is labeled with the datetime of its earliest STAC Item.
+    fuse : str, optional
+        How to fuse overlapping pixels of the STAC Items of a time step. Either 'first'
+        (default), which takes the first valid pixel in time order, or 'mean', which
+        averages the valid pixels (after masking, if `apply_mask` is True) of all STAC
+        Items of a time step. For 'first', the `SCL` band is fused with 'first' as
+        well, as it is categorical. Slices of the same acquisition observe the same
+        scene, so their `SCL` classes agree where they overlap. For 'mean', each STAC
+        Item is loaded and masked as a separate time step before the time steps are
+        averaged, which needs more memory and Dask tasks than 'first'.
+    
     Returns
     -------
     Dataset
@@ -81,52 +115,66 @@ def load_s2_l2a(bounds: tuple[float, float, float, float] = None,
     if bounds is None and collection_ids is None:
         raise ValueError("Either `bounds` or `collection_ids` must be provided.")
     
-    catalog = Catalog.from_file(anc.get_catalog_path(product=product))
+    catalog = anc.get_catalog(product=product)
     _, items = query.filter_stac_catalog(catalog=catalog, 
                                          bbox=bounds,
                                          collection_ids=collection_ids,
                                          time_range=time_range,
-                                         time_pattern=time_pattern)
+                                         time_pattern=time_pattern,
+                                         geometry=geometry)
     
     params = anc.common_params()
     if override_defaults is not None:
         params = anc.override_common_params(params=params, **override_defaults)
     chunks = params.pop('chunks')
-    rechunk = None
+    
+    # Load the bands and (if needed) the SCL band in a single pass, so that they share
+    # the same chunks and can be masked blockwise without rechunking
+    band_cfg = {band: {'dtype': 'uint16', 'nodata': 0} for band in bands}
     if apply_mask:
-        rechunk = chunks.copy()
-        # make sure we use default chunks with time=1
-        chunks = anc.common_params()['chunks']
-        chunks['time'] = 1
+        band_cfg['SCL'] = {'dtype': 'uint8', 'nodata': 0}
+    params = anc.band_params(params=params, band_cfg=band_cfg)
     
-    ds = odc_stac_load(items=items, bands=bands, bbox=bounds,
-                       nodata=0, dtype='uint16', chunks=chunks, **params)
+    # Group the slices of an acquisition into a single time step while loading, so
+    # that they are fused before they are masked. For 'mean', each STAC Item is loaded
+    # as a separate time step, masked and averaged afterwards
+    lon = None if bounds is None else (bounds[0] + bounds[2]) / 2
+    params['groupby'] = mosaic.odc_groupby(items, groupby=groupby, lon=lon, fuse=fuse)
     
-    if apply_mask:
-        valid = _mask(items=items, bounds=bounds, chunks=chunks, params=params)
-        ds = xr.where(valid, ds, 0)
+    ds = odc_stac_load(items=items, bands=list(band_cfg), bbox=bounds,
+                       chunks=chunks, **params)
+    ds = anc.assign_item_properties(ds, items=items,
+                                    properties=anc.S2_ITEM_PROPERTIES)
+    
+    # Mask, normalize the values to range [0, 1] and convert to float32 in a single
+    # blockwise step per band (or only mask if the integer values should be kept)
+    scl = [ds.SCL] if apply_mask else []
+    ds = ds[bands]
+    func, dtype = (_mask, 'uint16') if as_uint16 else (_mask_and_scale, 'float32')
+    with _profiling.stage('masking'):
+        for band in bands:
+            ds[band] = xr.apply_ufunc(func, ds[band], *scl,
+                                      dask='parallelized', output_dtypes=[dtype])
+            if as_uint16:
+                ds[band] = ds[band].assign_attrs(nodata=0, scale_factor=1/10000,
+                                                 add_offset=0.0)
     
-    # Normalize the values to range [0, 1] and convert to float32
-    ds = ds / 10000
-    cond = (ds > 0) & (ds <= 1)
-    ds = xr.where(cond, ds, np.nan).astype("float32")
+    if fuse == 'mean':
+        codes, _ = mosaic.group_items(items, groupby=groupby, lon=lon)
+        ds = mosaic.fuse_groups(ds, codes=codes)
     
     # Optional processing steps
     if group_acq_slices:
         ds = groupby_acq_slices(ds)
-    if apply_mask:
-        ds = ds.chunk(rechunk)
     return ds
 
 
-def _mask(items: Iterable[Item],
-          bounds: tuple[float, float, float, float],
-          chunks: dict[str, Any],
-          params: dict[str, Any]
-          ) -> DataArray:
+def _valid(data: ndarray,
+           scl: Optional[ndarray] = None
+           ) -> ndarray:
     """
-    Creates a valid-data mask from the `SCL` (Scene Classification Layer) band of
-    Sentinel-2 L2A data.
+    Creates a valid-data mask for a block of Sentinel-2 L2A data from its value range
+    and its `SCL` (Scene Classification Layer) band (if provided).
     
     Notes
     -----
@@ -136,11 +184,34 @@ def _mask(items: Iterable[Item],
     The selection of which classes to consider as valid data is based on
     Baetens et al. (2019): https://doi.org/10.3390/rs11040433 (Table 4).
     """
-    ds = odc_stac_load(items=items, bands='SCL', bbox=bounds, 
-                       nodata=0, dtype='uint8', chunks=chunks, **params)
-    mask = ((ds.SCL == 2) |  # dark area pixels
-            (ds.SCL > 3) &   # vegetation, bare soils, water, unclassified
-            (ds.SCL <= 7) |
-            (ds.SCL == 11)   # snow/ice
-            )
-    return mask
+    valid = (data > 0) & (data <= 10000)
+    if scl is not None:
+        valid &= ((scl == 2) |  # dark area pixels
+                  (scl > 3) &   # vegetation, bare soils, water, unclassified
+                  (scl <= 7) |
+                  (scl == 11)   # snow/ice
+                  )
+    return valid
+
+
+def _mask_and_scale(data: ndarray,
+                    scl: Optional[ndarray] = None
+                    ) -> ndarray:
+    """
+    Masks a block of Sentinel-2 L2A data and normalizes the values to range [0, 1].
+    Invalid pixels are set to NaN.
+    """
+    out = data.astype('float32')
+    out /= np.float32(10000)
+    out[~_valid(data, scl)] = np.nan
+    return out
+
+
+def _mask(data: ndarray,
+          scl: Optional[ndarray] = None
+          ) -> ndarray:
+    """
+    Masks a block of Sentinel-2 L2A data while keeping its integer values. Invalid
+    pixels are set to 0.
+    """
+    return np.where(_valid(data, scl), data, 0).astype('uint16')
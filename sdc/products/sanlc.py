@@ -1,4 +1,3 @@
-from pystac import Catalog
 from odc.stac import load as odc_stac_load
 
 from typing import Optional
@@ -48,7 +47,7 @@ def load_sanlc(bounds: tuple[float],
     """
     product = 'sanlc_2'
     
-    catalog = Catalog.from_file(anc.get_catalog_path(product=product))
+    catalog = anc.get_catalog(product=product)
     _, items = query.filter_stac_catalog(catalog=catalog, bbox=bounds)
     
     params = anc.common_params()
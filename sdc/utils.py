@@ -1,17 +1,62 @@
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import threading
 import numpy as np
+import geopandas as gpd
 
-from typing import Optional
+from typing import Any, Optional
+from geopandas import GeoDataFrame
+from odc.geo.geobox import GeoBox
 from xarray import DataArray, Dataset
 import xarray as xr
 from numpy import ndarray
+from pandas import DataFrame
 
-from sdc.load import load_product
 
+# Factor of the subgrid used to estimate the fraction of a pixel covered by geometries
+MASK_SUPERSAMPLE = 4
 
-def groupby_acq_slices(ds: Dataset, use_flox=True) -> Dataset:
+# Maximum size in bytes of the in-memory cache of rasterized mask blocks (per process)
+MASK_CACHE_SIZE = 512 * 1024**2
+
+# Statistics of `zonal_stats` (besides percentiles) and their `flox` aggregations
+ZONAL_STATS = {'mean': 'nanmean', 'min': 'nanmin', 'max': 'nanmax', 'std': 'nanstd',
+               'var': 'nanvar', 'sum': 'nansum', 'count': 'count'}
+
+# Maximum number of pixels of the spatial window in which `zonal_stats` calculates the
+# percentiles of a group of neighbouring features as a single chunk
+QUANTILE_WINDOW_SIZE = 2048**2
+
+_MASK_CACHE: OrderedDict[tuple[Any, ...], ndarray] = OrderedDict()
+_MASK_CACHE_LOCK = threading.Lock()
+
+
+def groupby_acq_slices(ds: Dataset,
+                       use_flox: bool = True,
+                       method: str = 'mean',
+                       max_gap: str = '1h'
+                       ) -> Dataset:
     """
-    Groups acquisition slices of all data variables in a Dataset by calculating the mean
-    for each rounded 1-hour time interval.
+    Groups acquisition slices of all data variables in a Dataset, e.g. adjacent scenes
+    of the same Sentinel-1 orbit or Sentinel-2 datatake, into a single time step.
+    
+    Time steps are assigned to the same acquisition if they share the same acquisition
+    metadata (see `sdc.products._mosaic.ACQ_SLICE_KEYS`, e.g. relative orbit or
+    datatake ID, as added by `load_product` for Sentinel-1 RTC and Sentinel-2 L2A) and
+    are not further apart than `max_gap` from the previous time step of the
+    acquisition. If no acquisition metadata is available, time steps are grouped by
+    `max_gap` only. Each group is labeled with its earliest time step. To group
+    acquisition slices already while loading (without reading each slice as a separate
+    time step), use the `groupby` parameter of `load_product` instead.
+    
+    The data is neither copied nor rechunked. If all time steps of an acquisition are
+    located in the same chunk (e.g. the default chunks of `load_product` with a single
+    chunk along the time dimension), each chunk is reduced independently.
+    
+    Integer data variables with a `nodata` attribute (e.g. Sentinel-2 L2A loaded with
+    `as_uint16=True`) are masked before grouping and are returned with their original
+    data type and nodata value.
     
     Parameters
     ----------
@@ -19,43 +64,143 @@ def groupby_acq_slices(ds: Dataset, use_flox=True) -> Dataset:
         The Dataset to be grouped.
     use_flox : bool, optional
         Whether to use the `flox` backend for the operation. Defaults to True.
+    method : str, optional
+        How to combine the slices of an acquisition. Either 'mean' (default), which
+        calculates the mean of all valid values, or 'mosaic', which takes the first
+        valid value in time order.
+    max_gap : str, optional
+        Maximum time difference between consecutive slices of an acquisition. Defaults
+        to '1h'.
     
     Returns
     -------
-    ds_copy : Dataset
+    Dataset
         The grouped Dataset.
     """
-    ds_copy = ds.copy(deep=True)
-    ds_copy.coords['time'] = ds_copy.time.dt.round('1h')
-    with xr.set_options(use_flox=use_flox):
-        ds_copy = ds_copy.groupby('time').mean(skipna=True)
-    if len(np.unique(ds.time.dt.date)) < len(ds_copy.time):
-        print("Warning: Might have missed to group some acquisition slices!")
-    return ds_copy
+    from sdc.products import _mosaic
+    
+    codes, first = acq_slice_groups(ds, max_gap=max_gap)
+    return _mosaic.fuse_groups(ds, codes=codes, first=first, method=method,
+                               use_flox=use_flox)
 
 
-def mask_from_vec(vec: str,
-                  da: Optional[DataArray] = None
-                  ) -> ndarray:
+def acq_slice_groups(ds: Dataset,
+                     max_gap: str = '1h'
+                     ) -> tuple[ndarray, ndarray]:
     """
-    Create a boolean mask from a vector file. The mask will have the same shape and
-    transform as the provided DataArray. If no DataArray is given, the `sanlc` product 
-    will be loaded with the bounding box of the vector file and used as the template.
+    Assigns the time steps of a Dataset to acquisitions (see `groupby_acq_slices`).
+    Only the time coordinate and the acquisition metadata are read, not the data.
     
     Parameters
     ----------
-    vec : str
-        Path to a vector file readable by geopandas (e.g. shapefile, GeoJSON, etc.).
-    da : DataArray, optional
-        DataArray to use as a template for the mask, which will be created with the same
-        shape and transform as the DataArray. If None (default), the `sanlc` product
-        will be loaded with the bounding box of the vector file and used as the
-        template.
+    ds : Dataset
+        The Dataset with a time dimension.
+    max_gap : str, optional
+        Maximum time difference between consecutive slices of an acquisition. Defaults
+        to '1h'.
     
     Returns
     -------
-    mask : ndarray
-        The output mask as a boolean NumPy array.
+    codes : ndarray
+        The index of the acquisition of each time step. Acquisitions are numbered in
+        the order of their earliest time step.
+    first : ndarray
+        The index of the earliest time step of each acquisition.
+    """
+    from sdc.products import _mosaic
+    
+    keys = [k for k in _mosaic.ACQ_SLICE_KEYS
+            if k in ds.coords and ds[k].dims == ('time',)]
+    meta = list(zip(*[ds[k].values.tolist() for k in keys]))
+    return _mosaic.group_acquisitions(ds.time.values, keys=meta, max_gap=max_gap)
+
+
+def apply_scale_factor(ds: Dataset | DataArray) -> Dataset | DataArray:
+    """
+    Converts scaled integer data (e.g. Sentinel-2 L2A loaded with `as_uint16=True`) to
+    float32 values by applying the `scale_factor` and `add_offset` attributes. Pixels
+    equal to the `nodata` attribute are set to NaN. Data variables without a
+    `scale_factor` attribute are returned unchanged.
+    
+    Parameters
+    ----------
+    ds : Dataset or DataArray
+        The Dataset or DataArray to be converted.
+    
+    Returns
+    -------
+    Dataset or DataArray
+        The converted Dataset or DataArray.
+    """
+    if isinstance(ds, Dataset):
+        return ds.map(apply_scale_factor, keep_attrs=False).assign_attrs(ds.attrs)
+    if 'scale_factor' not in ds.attrs:
+        return ds
+    attrs = {k: v for k, v in ds.attrs.items()
+             if k not in ['scale_factor', 'add_offset', 'nodata']}
+    da = ds.astype('float32') * np.float32(ds.attrs['scale_factor'])
+    da = da + np.float32(ds.attrs.get('add_offset', 0.0))
+    if 'nodata' in ds.attrs:
+        da = da.where(ds != ds.attrs['nodata'])
+    da.attrs = attrs
+    return da
+
+
+def mask_from_vec(vec: str | Path | GeoDataFrame,
+                  da: Optional[Dataset | DataArray] = None,
+                  geobox: Optional[GeoBox] = None,
+                  chunks: Optional[tuple[int, int]] = None,
+                  labels: bool | str = False,
+                  fraction: bool = False,
+                  all_touched: bool = False
+                  ) -> DataArray:
+    """
+    Create a mask from the geometries of a vector file. The mask will have the same
+    grid (shape, transform and CRS) as the provided DataArray, Dataset or GeoBox. If
+    neither is given, the grid is derived from the bounding box of the vector file and
+    the default loading parameters of `load_product` (EPSG:4326 with a resolution of
+    0.0002 degrees), so that no product needs to be loaded.
+    
+    If the template is chunked (or `chunks` is given), the mask is rasterized lazily
+    chunk by chunk with the same spatial chunks as the template. Only the geometries
+    intersecting a chunk are rasterized for it and chunks not intersecting any
+    geometry are filled without rasterizing. Rasterized chunks are cached in memory
+    per geometries and grid, so repeated calls (e.g. for several products on the same
+    grid) don't rasterize again.
+    
+    Parameters
+    ----------
+    vec : str or Path or GeoDataFrame
+        Path to a vector file readable by geopandas (e.g. shapefile, GeoJSON, etc.) or
+        a GeoDataFrame. Geometries without a CRS are assumed to be in EPSG:4326.
+    da : DataArray or Dataset, optional
+        DataArray or Dataset to use as a template for the mask, which will be created
+        with the same grid, spatial coordinates and spatial chunks.
+    geobox : GeoBox, optional
+        GeoBox to use as a template for the mask if `da` is not given.
+    chunks : tuple of int, optional
+        Spatial chunks of the mask in the format (y, x) if the template is not
+        chunked. Default is None, which creates an in-memory mask for templates that
+        are not chunked.
+    labels : bool or str, optional
+        Whether to create a label mask instead of a boolean mask, in which each pixel
+        holds the integer ID of the feature covering it and 0 elsewhere. If True, the
+        features are numbered from 1 in the order of the vector file. If the name of a
+        column is given, its (non-zero integer) values are used as IDs. Where features
+        overlap, the later feature takes precedence. Default is False.
+    fraction : bool, optional
+        Whether to create a mask of the fraction of each pixel covered by the
+        geometries (float32 values between 0 and 1) instead of a boolean mask. The
+        fraction is estimated on a 4x4 subgrid of each pixel. Default is False.
+    all_touched : bool, optional
+        Whether all pixels touched by the geometries are considered inside instead of
+        only pixels whose center is within them. Default is False.
+    
+    Returns
+    -------
+    mask : DataArray
+        The output mask with the spatial coordinates of the template (boolean, int32
+        if `labels` is given or float32 if `fraction` is True).
     
     Examples
     --------
@@ -64,28 +209,365 @@ def mask_from_vec(vec: str,
     
     >>> vec = 'path/to/vector/file.geojson'
     >>> ds = load_product(product='s2_l2a', vec=vec)
-    >>> mask = utils.mask_from_vec(vec=vec, da=ds.B04)
+    >>> mask = utils.mask_from_vec(vec=vec, da=ds)
     >>> ds_masked = ds.where(mask)
     """
-    import geopandas as gpd
+    from odc.geo.xr import xr_coords
+    
+    if labels is not False and fraction:
+        raise ValueError("A label mask can't be combined with `fraction=True`.")
+    
+    gdf = vec if isinstance(vec, GeoDataFrame) else gpd.read_file(vec)
+    if gdf.crs is None:
+        gdf = gdf.set_crs('EPSG:4326')
+    if da is not None:
+        geobox = da.odc.geobox
+        dims = da.odc.spatial_dims
+        coords = {d: da[d] for d in dims}
+        if 'spatial_ref' in da.coords:
+            coords['spatial_ref'] = da['spatial_ref']
+        chunksizes = da.chunksizes
+        if all(d in chunksizes for d in dims):
+            chunks = tuple(chunksizes[d] for d in dims)
+    else:
+        if geobox is None:
+            geobox = _default_geobox(gdf)
+        dims = geobox.dimensions
+        coords = xr_coords(geobox)
+    
+    gdf = gdf.to_crs(geobox.crs.to_wkt())
+    values = _label_values(gdf, labels=labels)
+    dtype = np.dtype('int32' if labels is not False else
+                     'float32' if fraction else 'bool')
+    
+    data = _rasterize(geoms=gdf.geometry.values, values=values, geobox=geobox,
+                      dtype=dtype, chunks=chunks, fraction=fraction,
+                      all_touched=all_touched)
+    return DataArray(data, coords=coords, dims=dims, name='mask')
+
+
+def _label_values(gdf: GeoDataFrame,
+                  labels: bool | str = False
+                  ) -> ndarray:
+    """Gets the value of each feature to be rasterized (see `mask_from_vec`)."""
+    if labels is True:
+        return np.arange(1, len(gdf) + 1, dtype='int32')
+    if labels:
+        return gdf[labels].to_numpy().astype('int32')
+    return np.ones(len(gdf), dtype='int32')
+
+
+def _default_geobox(gdf: GeoDataFrame) -> GeoBox:
+    """
+    Creates the GeoBox that `load_product` loads for the bounding box of the
+    geometries with the default loading parameters.
+    """
+    from odc.geo.geom import BoundingBox
+    from sdc.products import _ancillary as anc
+    
+    params = anc.common_params()
+    bbox = BoundingBox(*gdf.to_crs('EPSG:4326').total_bounds, crs='EPSG:4326')
+    return GeoBox.from_bbox(bbox.to_crs(params['crs']), crs=params['crs'],
+                            resolution=params['resolution'])
+
+
+def _rasterize(geoms: ndarray,
+               values: ndarray,
+               geobox: GeoBox,
+               dtype: np.dtype,
+               chunks: Optional[tuple[int, ...] | tuple[tuple[int, ...], ...]] = None,
+               fraction: bool = False,
+               all_touched: bool = False
+               ) -> ndarray | Any:
+    """
+    Rasterizes geometries (in the CRS of the GeoBox) either at once or lazily as a
+    Dask array with the given spatial chunks. Only the geometries intersecting a chunk
+    are rasterized for it.
+    """
+    import shapely
+    from dask.array import Array
+    from dask.array.core import normalize_chunks
+    from dask.highlevelgraph import HighLevelGraph
+    
+    tree = shapely.STRtree(geoms)
+    digest = hashlib.sha1(b''.join(shapely.to_wkb(geoms)) +
+                          values.tobytes()).hexdigest()
+    options = (dtype.str, fraction, all_touched)
+    
+    def _block(block_geobox: GeoBox) -> tuple[Any, ...]:
+        idx = np.sort(tree.query(shapely.box(*block_geobox.extent.boundingbox)))
+        if len(idx) == 0:
+            return (np.zeros, tuple(block_geobox.shape), dtype)
+        key = (digest, _grid_key(block_geobox), options)
+        return (_rasterize_block, geoms[idx], values[idx], block_geobox, dtype,
+                fraction, all_touched, key)
+    
+    if chunks is None:
+        func, *args = _block(geobox)
+        return func(*args)
+    
+    chunks = normalize_chunks(chunks, shape=tuple(geobox.shape))
+    y_off, x_off = [np.cumsum((0,) + c) for c in chunks]
+    grid = hashlib.sha1(repr((_grid_key(geobox), chunks, options)).encode())
+    name = f"mask-{digest}-{grid.hexdigest()}"
+    dsk = {}
+    for i, j in np.ndindex(len(chunks[0]), len(chunks[1])):
+        block_geobox = geobox[y_off[i]:y_off[i + 1], x_off[j]:x_off[j + 1]]
+        dsk[(name, i, j)] = _block(block_geobox)
+    graph = HighLevelGraph.from_collections(name, dsk, dependencies=[])
+    return Array(graph, name, chunks=chunks, dtype=dtype)
+
+
+def _rasterize_block(geoms: ndarray,
+                     values: ndarray,
+                     geobox: GeoBox,
+                     dtype: np.dtype,
+                     fraction: bool,
+                     all_touched: bool,
+                     key: tuple[Any, ...]
+                     ) -> ndarray:
+    """
+    Rasterizes geometries into a block or returns the block from the in-memory cache
+    of rasterized blocks. The returned array is read-only.
+    """
     from rasterio.features import rasterize
+    from affine import Affine
     
-    if da is None:
-        da = load_product(product="sanlc", vec=vec)
-    if 'time' in da.dims:
-        da = da.isel(time=0)
+    with _MASK_CACHE_LOCK:
+        if key in _MASK_CACHE:
+            _MASK_CACHE.move_to_end(key)
+            return _MASK_CACHE[key]
     
-    vec_data = gpd.read_file(vec)
-    mask = rasterize([(geom, 1) for geom in vec_data.geometry],
-                     out_shape=da.shape,
-                     transform=da.odc.transform)
-    return mask.astype('bool')
+    ny, nx = geobox.shape
+    if fraction:
+        n = MASK_SUPERSAMPLE
+        block = rasterize(zip(geoms, values), out_shape=(ny * n, nx * n),
+                          transform=geobox.transform * Affine.scale(1 / n),
+                          all_touched=all_touched, dtype='uint8')
+        block = block.reshape(ny, n, nx, n).mean(axis=(1, 3), dtype='float32')
+    else:
+        block = rasterize(zip(geoms, values), out_shape=(ny, nx),
+                          transform=geobox.transform, all_touched=all_touched,
+                          dtype='int32')
+    block = block.astype(dtype, copy=False)
+    block.flags.writeable = False
+    
+    with _MASK_CACHE_LOCK:
+        _MASK_CACHE[key] = block
+        size = sum(b.nbytes for b in _MASK_CACHE.values())
+        while size > MASK_CACHE_SIZE and len(_MASK_CACHE) > 1:
+            size -= _MASK_CACHE.popitem(last=False)[1].nbytes
+    return block
+
+
+def _grid_key(geobox: GeoBox) -> tuple[Any, ...]:
+    """Creates a hashable key of the grid of a GeoBox."""
+    return tuple(geobox.shape), tuple(geobox.affine)[:6], geobox.crs.to_wkt()
+
+
+def zonal_stats(ds: Dataset | DataArray,
+                vec: str | Path | GeoDataFrame,
+                stats: str | list[str] = 'mean',
+                labels: bool | str = True,
+                all_touched: bool = False,
+                as_dataframe: bool = True
+                ) -> DataFrame | Dataset:
+    """
+    Calculates statistics of all data variables within each feature of a vector file,
+    e.g. time series of the mean backscatter per field.
+    
+    All features are rasterized into a single label mask (see `mask_from_vec`) and
+    the statistics of all features are calculated with grouped reductions over the
+    spatial dimensions (using `flox`), so each chunk of the data is only read once,
+    independent of the number of features. Percentiles (including the median) need
+    all pixels of a feature in the same chunk instead, so neighbouring features are
+    grouped into windows of at most `QUANTILE_WINDOW_SIZE` pixels, which are
+    rechunked to a single spatial chunk each. A feature larger than that still gets
+    a single chunk of its own bounding box. Where features overlap, overlapping
+    pixels are only assigned to the later feature.
+    
+    Scaled integer data (e.g. Sentinel-2 L2A loaded with `as_uint16=True`) is
+    converted with `apply_scale_factor` and pixels equal to the `nodata` attribute of
+    integer data are ignored.
+    
+    Parameters
+    ----------
+    ds : Dataset or DataArray
+        The data, e.g. as returned by `load_product`. Only data variables with both
+        spatial dimensions are used.
+    vec : str or Path or GeoDataFrame
+        Path to a vector file readable by geopandas (e.g. shapefile, GeoJSON, etc.) or
+        a GeoDataFrame.
+    stats : str or list of str, optional
+        The statistics to calculate. Supported are 'mean' (default), 'median', 'min',
+        'max', 'std', 'var', 'sum', 'count' (number of valid pixels) and percentiles
+        in the format 'pXX' (e.g. 'p10' or 'p97.5').
+    labels : bool or str, optional
+        The IDs of the features. If True (default), the features are numbered from 1
+        in the order of the vector file. If the name of a column is given, its
+        (non-zero integer) values are used as IDs.
+    all_touched : bool, optional
+        Whether all pixels touched by a feature are considered inside instead of only
+        pixels whose center is within it. Default is False.
+    as_dataframe : bool, optional
+        Whether to compute the statistics and return them as a DataFrame. If False,
+        a lazy Dataset is returned instead. Default is True.
+    
+    Returns
+    -------
+    DataFrame or Dataset
+        The statistics of each feature with one column (or data variable) per data
+        variable and statistic named '<variable>_<statistic>'. The DataFrame is
+        indexed by feature ID ('id') and the remaining (e.g. 'time') dimensions of the
+        data. Features without valid pixels get NaN (or 0 for 'count').
+    
+    Examples
+    --------
+    >>> import sdc.utils as utils
+    >>> from sdc.load import load_product
+    
+    >>> vec = 'path/to/vector/fields.geojson'
+    >>> ds = load_product(product='s1_rtc', vec=vec)
+    >>> df = utils.zonal_stats(ds=ds[['vv', 'vh']], vec=vec, stats=['mean', 'p90'])
+    """
+    from flox.xarray import xarray_reduce
+    from sdc.products import _mosaic
+    
+    if isinstance(stats, str):
+        stats = [stats]
+    quantiles = {stat: _stat_quantile(stat) for stat in stats
+                 if stat not in ZONAL_STATS}
+    
+    if isinstance(ds, DataArray):
+        ds = ds.to_dataset(name=ds.name if ds.name is not None else 'data')
+    dims = ds.odc.spatial_dims
+    geobox = ds.odc.geobox
+    ds = ds[[v for v in ds.data_vars if set(dims).issubset(ds[v].dims)]]
+    
+    gdf = vec if isinstance(vec, GeoDataFrame) else gpd.read_file(vec)
+    label = mask_from_vec(gdf, da=ds, labels=labels, all_touched=all_touched)
+    label = label.rename('id').drop_vars('spatial_ref', errors='ignore')
+    ids = np.unique(_label_values(gdf, labels=labels))
+    
+    ds = apply_scale_factor(ds.assign(
+        {v: ds[v].where(ds[v] != ds[v].attrs['nodata'])
+         for v in _mosaic.masked_int_vars(ds) if 'scale_factor' not in ds[v].attrs}))
+    
+    results = []
+    for stat in stats:
+        if stat in quantiles:
+            continue
+        out = xarray_reduce(ds, label, func=ZONAL_STATS[stat], expected_groups=ids,
+                            dim=dims, fill_value=0 if stat == 'count' else np.nan,
+                            keep_attrs=False)
+        results.append(out.rename({v: f"{v}_{stat}" for v in out.data_vars}))
+    if quantiles:
+        chunks = {d: 'auto' for d in ds.dims if d not in dims}
+        windows = _feature_windows(gdf, geobox=geobox, labels=labels)
+        parts = []
+        for batch, window in _window_batches(windows, QUANTILE_WINDOW_SIZE):
+            window = dict(zip(dims, window))
+            ds_window = ds.isel(window).chunk({**chunks, **{d: -1 for d in dims}})
+            # Empty features are filled with NaN by `nanquantile` itself, as `flox`
+            # can't apply `fill_value` (via `min_count`) to several quantiles at once
+            parts.append(xarray_reduce(
+                ds_window, label.isel(window).chunk(-1), func='nanquantile',
+                expected_groups=np.array(batch), dim=dims, fill_value=np.nan,
+                min_count=0, keep_attrs=False, method='blockwise',
+                q=list(quantiles.values())))
+        out = xr.concat(parts, dim='id').sel(id=ids)
+        for i, stat in enumerate(quantiles):
+            out_q = out.isel(quantile=i, drop=True)
+            results.append(out_q.rename({v: f"{v}_{stat}" for v in out_q.data_vars}))
+    
+    ds_out = xr.merge(results, compat='override')
+    ds_out = ds_out.drop_vars('spatial_ref', errors='ignore')
+    ds_out = ds_out[[f"{v}_{stat}" for v in ds.data_vars for stat in stats]]
+    ds_out = ds_out.transpose('id', ...)
+    if not as_dataframe:
+        return ds_out
+    dim_order = ['id'] + [d for d in ds_out.dims if d != 'id']
+    return ds_out.compute().to_dataframe(dim_order=dim_order)
+
+
+def _stat_quantile(stat: str) -> float:
+    """Gets the quantile of a percentile statistic (e.g. 0.9 for 'p90')."""
+    if stat == 'median':
+        return 0.5
+    try:
+        if not stat.startswith('p'):
+            raise ValueError
+        q = float(stat[1:]) / 100
+        if not 0 <= q <= 1:
+            raise ValueError
+    except ValueError:
+        raise ValueError(f"Statistic '{stat}' is not supported. Use one of "
+                         f"{list(ZONAL_STATS) + ['median']} or a percentile in the "
+                         f"format 'pXX'.") from None
+    return q
+
+
+def _feature_windows(gdf: GeoDataFrame,
+                     geobox: GeoBox,
+                     labels: bool | str = True
+                     ) -> dict[int, tuple[int, int, int, int]]:
+    """
+    Gets the pixel window (y_start, y_stop, x_start, x_stop) of the bounding box of
+    each feature ID (see `mask_from_vec`), padded by one pixel. Windows of features
+    outside the grid are clipped to a single pixel at its edge.
+    """
+    if gdf.crs is None:
+        gdf = gdf.set_crs('EPSG:4326')
+    bounds = gdf.to_crs(geobox.crs.to_wkt()).bounds.to_numpy()
+    ny, nx = geobox.shape
+    windows = {}
+    for fid, (minx, miny, maxx, maxy) in zip(_label_values(gdf, labels=labels), bounds):
+        if np.isnan(minx):
+            minx = miny = maxx = maxy = 0.0
+        cols, rows = ~geobox.affine * (np.array([minx, maxx]), np.array([maxy, miny]))
+        y0, x0 = [int(np.clip(np.floor(v.min()) - 1, 0, n - 1))
+                  for v, n in [(rows, ny), (cols, nx)]]
+        y1, x1 = [int(np.clip(np.ceil(v.max()) + 1, start + 1, n))
+                  for v, n, start in [(rows, ny, y0), (cols, nx, x0)]]
+        if fid in windows:
+            wy0, wy1, wx0, wx1 = windows[fid]
+            y0, y1, x0, x1 = min(y0, wy0), max(y1, wy1), min(x0, wx0), max(x1, wx1)
+        windows[int(fid)] = (y0, y1, x0, x1)
+    return windows
+
+
+def _window_batches(windows: dict[int, tuple[int, int, int, int]],
+                    max_size: int
+                    ) -> list[tuple[list[int], tuple[slice, slice]]]:
+    """
+    Groups features into batches of neighbouring features (in row-major order of
+    their windows) whose common window has at most `max_size` pixels. A feature with
+    a larger window forms a batch of its own.
+    """
+    batches = []
+    for fid in sorted(windows, key=lambda i: (windows[i][0], windows[i][2])):
+        window = windows[fid]
+        if batches:
+            ids, (y0, y1, x0, x1) = batches[-1]
+            union = (min(y0, window[0]), max(y1, window[1]),
+                     min(x0, window[2]), max(x1, window[3]))
+            if (union[1] - union[0]) * (union[3] - union[2]) <= max_size:
+                batches[-1] = (ids + [fid], union)
+                continue
+        batches.append(([fid], window))
+    return [(ids, (slice(y0, y1), slice(x0, x1))) for ids, (y0, y1, x0, x1) in batches]
 
 
 def separate_asc_desc(ds: Dataset) -> tuple[Dataset, Dataset]:
     """
     Separates a Dataset into ascending and descending orbits.
     
+    The time steps are selected by integer indexing along the time dimension, so the
+    data is neither copied nor computed. The orbit state is taken from the
+    `sat:orbit_state` coordinate (as added by `load_product` for Sentinel-1 RTC). If
+    it is not available, time steps acquired after 12:00 UTC are considered ascending
+    and time steps acquired before 12:00 UTC descending.
+    
     Parameters
     ----------
     ds: Dataset
@@ -98,22 +580,51 @@ def separate_asc_desc(ds: Dataset) -> tuple[Dataset, Dataset]:
         Two xarray Datasets containing the ascending and descending orbit data,
         respectively.
     """
-    ds_copy = ds.copy(deep=True)
+    _check_s1(ds)
     
-    if not any([x in ds_copy.data_vars for x in ['vv', 'vh']]):
-        raise ValueError("Dataset doesn't contain Sentinel-1 data.")
+    if 'sat:orbit_state' in ds.coords:
+        state = ds['sat:orbit_state'].values
+    else:
+        hour = ds.time.dt.hour.values
+        state = np.where(hour > 12, 'ascending',
+                         np.where(hour < 12, 'descending', ''))
+    ds_asc = ds.isel(time=np.flatnonzero(state == 'ascending'))
+    ds_desc = ds.isel(time=np.flatnonzero(state == 'descending'))
+    return ds_asc, ds_desc
+
+
+def separate_rel_orbits(ds: Dataset) -> dict[int, Dataset]:
+    """
+    Separates a Dataset by relative orbit number, e.g. for time series analysis with a
+    constant acquisition geometry.
     
-    try:
-        ds_copy_asc = ds_copy.where(ds_copy['sat:orbit_state'] == 'ascending',
-                                    drop=True)
-        ds_copy_desc = ds_copy.where(ds_copy['sat:orbit_state'] == 'descending',
-                                     drop=True)
-    except KeyError:
-        _vars = list(ds_copy.data_vars)
-        ds_copy_asc = ds_copy.copy(deep=True)
-        ds_copy_asc = ds_copy_asc.drop_vars(_vars)
-        ds_copy_desc = ds_copy_asc.copy(deep=True)
-        for v in _vars:
-            ds_copy_asc[v] = ds_copy[v].where(ds_copy[v].time.dt.hour > 12, drop=True)
-            ds_copy_desc[v] = ds_copy[v].where(ds_copy[v].time.dt.hour < 12, drop=True)
-    return ds_copy_asc, ds_copy_desc
+    The time steps are selected by integer indexing along the time dimension, so the
+    data is neither copied nor computed. The relative orbit number is taken from the
+    `sat:relative_orbit` coordinate (as added by `load_product` for Sentinel-1 RTC).
+    
+    Parameters
+    ----------
+    ds: Dataset
+        An xarray Dataset with a `sat:relative_orbit` coordinate along the time
+        dimension. E.g. Sentinel-1 RTC.
+    
+    Returns
+    -------
+    dict of Dataset
+        The xarray Datasets containing the data of each relative orbit, keyed by the
+        relative orbit number in ascending order.
+    """
+    _check_s1(ds)
+    if 'sat:relative_orbit' not in ds.coords:
+        raise ValueError("Dataset doesn't contain the 'sat:relative_orbit' "
+                         "coordinate.")
+    
+    orbits = ds['sat:relative_orbit'].values
+    return {int(orbit): ds.isel(time=np.flatnonzero(orbits == orbit))
+            for orbit in np.unique(orbits)}
+
+
+def _check_s1(ds: Dataset) -> None:
+    """Raises an error if a Dataset doesn't contain Sentinel-1 backscatter data."""
+    if not any([x in ds.data_vars for x in ['vv', 'vh']]):
+        raise ValueError("Dataset doesn't contain Sentinel-1 data.")
@@ -0,0 +1,18 @@
+import numpy as np
+
+from benchmarks.synthetic import CHIRPS_RESOLUTION, _create_chirps
+from sdc.products.precip import load_chirps
+
+
+def test_load_chirps_single_pixel(tmp_path, monkeypatch):
+    """A one-pixel area of interest keeps its spatial dimensions."""
+    bounds = (31.0, -24.05, 31.04, -24.01)
+    _create_chirps(tmp_path.joinpath('CHIRPS'), bounds, years=[2020],
+                   rng=np.random.default_rng(0))
+    monkeypatch.setenv('SDC_DATA_ROOT', str(tmp_path))
+    
+    da = load_chirps(bounds=bounds)
+    
+    assert da.dims == ('time', 'latitude', 'longitude')
+    assert da.shape == (12, 1, 1)
+    assert abs(float(da.longitude[0]) - (31.0 + CHIRPS_RESOLUTION / 2)) < 1e-6